@@ -3,13 +3,34 @@ Main Flask Application
 Movie & Game Review PWA
 """
 
-from flask import Flask, render_template, session
+import logging
+from flask import Flask, render_template, request, session, url_for
+from markupsafe import Markup, escape
+from werkzeug.middleware.proxy_fix import ProxyFix
 import config
 import os
 from routes.auth import auth_bp
 from routes.reviews import reviews_bp
 from routes.main import main_bp
-from middleware.csrf import get_csrf_token
+from routes.api import api_bp
+from routes.sync import sync_bp
+from routes.debug import debug_bp
+from models.db import init_schema, release_db_connection
+from models.review import warm_cache, SNIPPET_START, SNIPPET_END
+from models.changes import start_compaction_thread
+from utils.posters import PosterIndex, PosterDerivatives
+from utils.fragment_cache import FragmentCacheExtension
+from utils.assets import init_assets
+from middleware.compression import compress_response
+from utils.metrics import init_metrics
+from utils.sql_trace import init_sql_trace
+from utils.tracing import init_tracing
+
+# Send model errors and SQL trace warnings to stderr
+logging.basicConfig(
+    level=config.LOG_LEVEL,
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
 
 # Create Flask application
 app = Flask(__name__)
@@ -17,16 +38,59 @@ app = Flask(__name__)
 # Load configuration
 app.config.from_object(config)
 
+# Take the client address and scheme from the trusted proxies' headers, so
+# the login throttle and the /metrics allow-list see real clients
+if config.TRUSTED_PROXY_COUNT:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=config.TRUSTED_PROXY_COUNT,
+                            x_proto=config.TRUSTED_PROXY_COUNT)
+
+# Enable the {% cache %} template tag
+app.jinja_env.add_extension(FragmentCacheExtension)
+
+# Content-hashed static URLs, immutable caching and `flask assets build`
+init_assets(app)
+
+# Request ids and sampled span traces (registered first so the root span
+# encloses the other request hooks)
+if config.TRACING_ENABLED:
+    init_tracing(app)
+
+# Request, SQL, bcrypt and cache metrics at /metrics
+if config.METRICS_ENABLED:
+    init_metrics(app)
+
+# Per-request SQL ledger with slow-query and N+1 logging
+if config.SQL_TRACE_ENABLED:
+    init_sql_trace(app)
+
 # Register blueprints
 app.register_blueprint(main_bp)
 app.register_blueprint(auth_bp, url_prefix='/auth')
 app.register_blueprint(reviews_bp, url_prefix='/reviews')
+app.register_blueprint(api_bp, url_prefix='/api/v1')
+app.register_blueprint(sync_bp, url_prefix='/api')
 
-# Make csrf_token available to all templates
-@app.context_processor
-def inject_csrf_token():
-    """Make CSRF token available in all templates"""
-    return dict(csrf_token=get_csrf_token())
+# Admin-only profiler and memory snapshots; nothing runs until they are requested
+if config.DEBUG_ENDPOINTS_ENABLED:
+    app.register_blueprint(debug_bp, url_prefix='/debug')
+
+# Bring the database schema up to date before serving requests
+init_schema()
+
+# Pre-load the home page collection so the first visitors hit the cache
+warm_cache()
+release_db_connection()
+
+# Keep the /api/sync change log small
+if config.SYNC_COMPACT_INTERVAL:
+    start_compaction_thread(config.SYNC_COMPACT_INTERVAL)
+
+# Hand each request's database connection back to the pool
+app.teardown_appcontext(release_db_connection)
+
+# Compress HTML/JSON responses (registered first, so it runs after the
+# other after_request hooks have finished the response)
+app.after_request(compress_response)
 
 # Set security headers
 @app.after_request
@@ -36,6 +100,35 @@ def set_security_headers(response):
         response.headers[header] = value
     return response
 
+# Let shared caches store pages served without a session
+@app.after_request
+def set_cache_headers(response):
+    """
+    Mark anonymous pages public and everything else private
+
+    Views that render forms create the CSRF token (and so the session) only
+    when they need it, so a visitor without a session cookie who reads
+    pages gets none, and those pages can be stored by a proxy or CDN.
+    Responses that set their own Cache-Control (static files) are left alone.
+    """
+    if 'Cache-Control' in response.headers:
+        return response
+
+    anonymous = (
+        request.method in ('GET', 'HEAD')
+        and response.status_code in (200, 304)
+        and not session
+        and not session.modified
+        and config.SESSION_COOKIE_NAME not in request.cookies
+    )
+    if anonymous:
+        response.headers['Cache-Control'] = f'public, max-age={config.ANONYMOUS_CACHE_MAX_AGE}'
+    else:
+        response.headers['Cache-Control'] = 'private, no-cache'
+    # The same URL is public or private depending on the session cookie
+    response.vary.add('Cookie')
+    return response
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
@@ -47,6 +140,11 @@ def forbidden(error):
     """403 error handler"""
     return render_template('errors/403.html'), 403
 
+@app.errorhandler(503)
+def service_unavailable(error):
+    """503 error handler (e.g. password hashing at capacity)"""
+    return render_template('errors/503.html'), 503, {'Retry-After': '2'}
+
 @app.errorhandler(500)
 def internal_error(error):
     """500 error handler"""
@@ -67,24 +165,64 @@ def truncate_text(text, length=150):
         return text
     return text[:length].rsplit(' ', 1)[0] + '...'
 
+# Poster lookup table, built once and refreshed when the directory changes
+poster_index = PosterIndex(
+    os.path.join(app.static_folder, 'images', 'posters'),
+    check_interval=config.POSTER_INDEX_CHECK_INTERVAL,
+    derivatives=PosterDerivatives(
+        os.path.join(app.static_folder, *config.POSTER_DERIVATIVE_DIR.split('/')),
+        config.POSTER_DERIVATIVE_DIR,
+        widths=config.POSTER_WIDTHS,
+        quality=config.POSTER_QUALITY,
+        generate=config.POSTER_DERIVATIVES_GENERATE
+    ) if config.POSTER_DERIVATIVES_ENABLED else None
+)
+poster_index.rebuild()
+app.extensions['poster_index'] = poster_index
+
 @app.template_filter('poster_path')
 def poster_path(title):
     """
     Given a game/movie title, return the static path to its poster image.
-    Checks for .png first, then .jpg/.jpeg. Returns None if no poster exists.
+    Prefers .png, then .jpg/.jpeg. Returns None if no poster exists.
     """
-    # Build the base filename: lowercase, spaces→underscores, strip : and '
-    filename = (
-        title.lower()
-             .replace(' ', '_')
-             .replace(':', '')
-             .replace("'", '')
-    )
-    posters_dir = os.path.join(app.static_folder, 'images', 'posters')
-    for ext in ('png', 'jpg', 'jpeg'):
-        if os.path.exists(os.path.join(posters_dir, f'{filename}.{ext}')):
-            return f'images/posters/{filename}.{ext}'
-    return None
+    return poster_index.lookup(title)
+
+@app.template_filter('poster_image')
+def poster_image(title):
+    """
+    Given a game/movie title, return responsive image data for its poster:
+    src, srcset and webp_srcset URLs, width, height, and a placeholder
+    colour and data URI. Returns None if the poster has no derivatives
+    (use poster_path for the original file).
+    """
+    image = poster_index.image(title)
+    if not image:
+        return None
+
+    def srcset(candidates):
+        return ', '.join(
+            f"{url_for('static', filename=path)} {width}w" for path, width in candidates
+        )
+
+    return {
+        'src': url_for('static', filename=image['jpeg'][-1][0]),
+        'srcset': srcset(image['jpeg']),
+        'webp_srcset': srcset(image['webp']),
+        'width': image['width'],
+        'height': image['height'],
+        'color': image['color'],
+        'placeholder': image['placeholder']
+    }
+
+
+@app.template_filter('highlight')
+def highlight(snippet):
+    """Escape a search snippet and turn its match markers into <mark> tags"""
+    if not snippet:
+        return ''
+    escaped = str(escape(snippet))
+    return Markup(escaped.replace(SNIPPET_START, '<mark>').replace(SNIPPET_END, '</mark>'))
 
 
 @app.template_filter('format_date')
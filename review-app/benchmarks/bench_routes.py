@@ -0,0 +1,405 @@
+"""
+Route Benchmarks
+Times the hot routes on a synthetic dataset and compares them with a baseline
+
+Usage:
+    python benchmarks/bench_routes.py [--size 1k|100k|1m] [--seed 42]
+    python benchmarks/bench_routes.py --size 100k --save-baseline
+    python benchmarks/bench_routes.py --size 100k --routes home,title
+
+The dataset is generated once by database/seed_data.py --generate into
+benchmarks/data/ and copied to a scratch file for every run, so each run starts from the same
+rows. Requests go through the real app and blueprints with the Flask test
+client, one at a time on this thread. For each route the report gives
+p50/p95/p99 latency, throughput, SQL statements per request and the process's
+peak RSS; results are written to benchmarks/results/ as JSON. When
+benchmarks/baselines/<size>.json exists the run is compared with it and the
+exit status is 1 if a route got slower than --threshold or runs more SQL.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.dirname(BENCH_DIR)
+DATA_DIR = os.path.join(BENCH_DIR, 'data')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+BASELINE_DIR = os.path.join(BENCH_DIR, 'baselines')
+
+# Dataset shapes, passed to seed_data.py --generate
+SIZES = {
+    '1k': {'reviews': 1_000, 'users': 200, 'titles': 300},
+    '100k': {'reviews': 100_000, 'users': 5_000, 'titles': 20_000},
+    '1m': {'reviews': 1_000_000, 'users': 20_000, 'titles': 100_000},
+}
+
+# Latency percentiles reported per route
+PERCENTILES = (50, 95, 99)
+
+# Untimed requests sent to each route first (fills caches and the pool)
+WARMUP_REQUESTS = 10
+
+# Login verifies a bcrypt hash (~250 ms at the default cost), so it gets fewer requests
+LOGIN_REQUESTS = 20
+
+class Workload:
+    """The app under test and the dataset's users, titles and reviews, sampled with a fixed seed"""
+
+    def __init__(self, app, path, seed, password):
+        """
+        Args:
+            app (Flask): Application under test
+            path (str): Its database
+            seed (int): Seed for picking titles, users and reviews
+            password (str): Every user's password
+        """
+        self.app = app
+        self.password = password
+        conn = sqlite3.connect(path)
+        try:
+            # Requests follow the data: popular titles and prolific users come up most
+            self.titles, title_weights = zip(*conn.execute(
+                "SELECT title, review_count FROM title_stats WHERE review_count > 0"))
+            self.authors, author_weights = zip(*conn.execute(
+                """SELECT r.user_id, COUNT(*) FROM reviews r
+                   GROUP BY r.user_id"""))
+            self.usernames = dict(conn.execute("SELECT id, username FROM users"))
+            self.reviews, self.first_id, self.last_id = conn.execute(
+                "SELECT COUNT(*), MIN(id), MAX(id) FROM reviews").fetchone()
+        finally:
+            conn.close()
+        self.title_weights = _cumulative(title_weights)
+        self.author_weights = _cumulative(author_weights)
+        self.rng = random.Random(seed)
+
+    def title(self):
+        return self.rng.choices(self.titles, cum_weights=self.title_weights)[0]
+
+    def author(self):
+        return self.rng.choices(self.authors, cum_weights=self.author_weights)[0]
+
+    def review_id(self):
+        # Synthetic ids have no gaps
+        return self.rng.randint(self.first_id, self.last_id)
+
+    def logged_in_client(self, user_id):
+        """A test client whose session is already logged in (no bcrypt involved)"""
+        from utils.security import generate_csrf_token
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+            session['username'] = self.usernames[user_id]
+            session['csrf_token'] = generate_csrf_token()
+            session.permanent = True
+        return client
+
+def _cumulative(weights):
+    total = 0
+    result = []
+    for weight in weights:
+        total += weight
+        result.append(total)
+    return result
+
+def _csrf_token(client):
+    with client.session_transaction() as session:
+        return session['csrf_token']
+
+# === Routes ===
+# Each route prepares one request (untimed) and returns
+# (client, method, path, form data, expected status).
+
+def route_home(workload, anonymous):
+    return anonymous, 'GET', '/', None, 200
+
+def route_title(workload, anonymous):
+    return anonymous, 'GET', '/reviews/title/' + quote(workload.title()), None, 200
+
+def route_review(workload, anonymous):
+    return anonymous, 'GET', f'/reviews/{workload.review_id()}', None, 200
+
+def route_my_reviews(workload, anonymous):
+    return workload.logged_in_client(workload.author()), 'GET', '/reviews/my', None, 200
+
+def route_login(workload, anonymous):
+    client = workload.app.test_client()
+    client.get('/auth/login')
+    form = {
+        'username': workload.usernames[workload.author()],
+        'password': workload.password,
+        'csrf_token': _csrf_token(client)
+    }
+    return client, 'POST', '/auth/login', form, 302
+
+def route_create(workload, anonymous):
+    client = workload.logged_in_client(workload.author())
+    form = {
+        'title': workload.title(),
+        'category': 'movie',
+        'rating': str(workload.rng.randint(1, 5)),
+        'review_text': 'Benchmark review with enough text to pass validation.',
+        'csrf_token': _csrf_token(client)
+    }
+    return client, 'POST', '/reviews/create', form, 302
+
+# Run in this order; create comes last because it changes the data the others read
+ROUTES = {
+    'home': route_home,
+    'title': route_title,
+    'review': route_review,
+    'my_reviews': route_my_reviews,
+    'login': route_login,
+    'create': route_create,
+}
+
+# === Measuring ===
+
+class StatementCounter:
+    """
+    Counts the SQL statements run on this thread (the test client's thread)
+
+    Background threads (change log compaction) and the query plans the SQL
+    trace looks up for slow queries are left out.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._thread = threading.get_ident()
+
+    def __call__(self, sql, params, seconds, executed, rows):
+        if executed and threading.get_ident() == self._thread and not sql.startswith('EXPLAIN'):
+            self.count += 1
+
+def peak_rss_mb():
+    """Highest resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+def percentile_summary(seconds):
+    """p50/p95/p99 (in ms) of a list of durations"""
+    cuts = statistics.quantiles(seconds, n=100, method='inclusive')
+    return {f'p{p}_ms': round(cuts[p - 1] * 1000, 3) for p in PERCENTILES}
+
+def bench_route(name, prepare, requests, workload, statements):
+    """
+    Time one route
+
+    Returns:
+        dict: Latency percentiles, throughput, SQL per request, peak RSS and errors
+    """
+    anonymous = workload.app.test_client()
+    for _ in range(WARMUP_REQUESTS):
+        client, method, path, data, _ = prepare(workload, anonymous)
+        client.open(path, method=method, data=data, buffered=True).close()
+
+    durations = []
+    sql_counts = []
+    errors = 0
+    for _ in range(requests):
+        client, method, path, data, expected = prepare(workload, anonymous)
+        before = statements.count
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=data, buffered=True)
+        durations.append(time.perf_counter() - started)
+        sql_counts.append(statements.count - before)
+        if response.status_code != expected:
+            errors += 1
+        response.close()
+
+    result = {
+        'requests': requests,
+        **percentile_summary(durations),
+        'mean_ms': round(statistics.fmean(durations) * 1000, 3),
+        'throughput_rps': round(requests / sum(durations), 1),
+        'sql_per_request': round(statistics.fmean(sql_counts), 2),
+        'sql_max': max(sql_counts),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'errors': errors
+    }
+    print(f"{name:<12} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+          f"{result['throughput_rps']:>9.1f} {result['sql_per_request']:>6.1f} "
+          f"{result['peak_rss_mb']:>8.1f} {errors:>6}", flush=True)
+    return result
+
+# === Baselines ===
+
+def compare(results, baseline, threshold):
+    """
+    Compare a run with a baseline
+
+    Latency regressions are increases beyond `threshold` (a fraction);
+    any increase in SQL statements per request is a regression, since the
+    count does not depend on the machine.
+
+    Returns:
+        list: Regression descriptions (empty if none)
+    """
+    regressions = []
+    print(f"\nCompared with the baseline from {baseline['meta']['timestamp']} "
+          f"({baseline['meta'].get('revision') or 'unknown revision'}):")
+    for name, current in results['routes'].items():
+        previous = baseline['routes'].get(name)
+        if previous is None:
+            print(f"{name:<12} (not in baseline)")
+            continue
+        changes = []
+        for metric in [f'p{p}_ms' for p in PERCENTILES] + ['throughput_rps']:
+            change = current[metric] / previous[metric] - 1 if previous[metric] else 0.0
+            changes.append(f"{metric.split('_')[0]} {change:+7.1%}")
+            if metric != 'throughput_rps' and change > threshold:
+                regressions.append(f"{name}: {metric} {previous[metric]} -> {current[metric]} ({change:+.1%})")
+        changes.append(f"SQL {previous['sql_per_request']} -> {current['sql_per_request']}")
+        if current['sql_per_request'] > previous['sql_per_request']:
+            regressions.append(f"{name}: SQL per request {previous['sql_per_request']} -> "
+                               f"{current['sql_per_request']}")
+        print(f"{name:<12} " + '  '.join(changes))
+    return regressions
+
+# === Running ===
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=APP_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def prepare_dataset(size, seed, rebuild):
+    """Build the dataset if needed and return its path"""
+    path = os.path.join(DATA_DIR, f'{size}-seed{seed}.db')
+    if rebuild or not os.path.exists(path):
+        print(f"Building the {size} dataset (seed {seed})...", flush=True)
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        os.makedirs(DATA_DIR, exist_ok=True)
+        shape = SIZES[size]
+        subprocess.run(
+            [sys.executable, os.path.join(APP_DIR, 'database', 'seed_data.py'), '--generate',
+             '--users', str(shape['users']), '--reviews', str(shape['reviews']),
+             '--titles', str(shape['titles']), '--seed', str(seed)],
+            env={**os.environ, 'DATABASE_PATH': path},
+            check=True
+        )
+    return path
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the hot routes on a synthetic dataset")
+    parser.add_argument('--size', choices=SIZES, default='1k', help="Dataset size (default: 1k)")
+    parser.add_argument('--seed', type=int, default=42, help="Dataset and request seed (default: 42)")
+    parser.add_argument('--requests', type=int, default=200,
+                        help="Timed requests per route (default: 200; login uses 20)")
+    parser.add_argument('--routes', help=f"Comma-separated routes (default: all of {', '.join(ROUTES)})")
+    parser.add_argument('--rebuild', action='store_true', help="Build the dataset again")
+    parser.add_argument('--output', help="Results file (default: benchmarks/results/<size>-<time>.json)")
+    parser.add_argument('--baseline', help="Baseline file (default: benchmarks/baselines/<size>.json)")
+    parser.add_argument('--save-baseline', action='store_true', help="Save this run as the baseline")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Latency increase counted as a regression (default: 0.2 = 20%%)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    routes = args.routes.split(',') if args.routes else list(ROUTES)
+    unknown = [name for name in routes if name not in ROUTES]
+    if unknown:
+        print(f"Error: unknown route(s): {', '.join(unknown)}")
+        return 2
+
+    try:
+        dataset = prepare_dataset(args.size, args.seed, args.rebuild)
+    except subprocess.CalledProcessError as e:
+        return e.returncode
+
+    # Work on a copy so created reviews and re-hashed passwords never reach the dataset
+    scratch_dir = tempfile.TemporaryDirectory(prefix='review-bench-')
+    scratch = os.path.join(scratch_dir.name, 'bench.db')
+    source, target = sqlite3.connect(dataset), sqlite3.connect(scratch)
+    source.backup(target)
+    source.close()
+    target.close()
+    os.environ['DATABASE_PATH'] = scratch
+    # Keep the per-request N+1 warnings out of the report
+    os.environ.setdefault('LOG_LEVEL', 'ERROR')
+
+    sys.path.insert(0, APP_DIR)
+    # Only now, so config reads the scratch DATABASE_PATH
+    from app import app
+    from models.db import add_statement_observer
+    sys.path.insert(0, os.path.join(APP_DIR, 'database'))
+    from seed_data import GENERATED_PASSWORD
+
+    statements = StatementCounter()
+    add_statement_observer(statements)
+    workload = Workload(app, scratch, args.seed, GENERATED_PASSWORD)
+
+    results = {
+        'meta': {
+            'size': args.size,
+            'seed': args.seed,
+            **SIZES[args.size],
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'startup_rss_mb': round(peak_rss_mb(), 1)
+        },
+        'routes': {}
+    }
+
+    print(f"\n{args.size} dataset: {workload.reviews:,} reviews, "
+          f"{len(workload.usernames):,} users, {len(workload.titles):,} titles\n")
+    print(f"{'route':<12} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9} "
+          f"{'SQL':>6} {'RSS MB':>8} {'errors':>6}")
+    for name in routes:
+        requests = min(args.requests, LOGIN_REQUESTS) if name == 'login' else args.requests
+        results['routes'][name] = bench_route(name, ROUTES[name], requests, workload, statements)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{args.size}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f'{args.size}.json')
+    for path in [output] + ([baseline_path] if args.save_baseline else []):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as results_file:
+            json.dump(results, results_file, indent=2)
+            results_file.write('\n')
+    print(f"\n[OK] Results written to {output}")
+    if args.save_baseline:
+        print(f"[OK] Saved as the baseline {baseline_path}")
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path} (save one with --save-baseline)")
+        return 0
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    if (baseline['meta']['size'], baseline['meta']['seed']) != (args.size, args.seed):
+        print("Error: the baseline was recorded on a different dataset")
+        return 2
+
+    regressions = compare(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"[REGRESSION] {regression}")
+    if regressions:
+        return 1
+    print("[OK] No regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
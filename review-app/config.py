@@ -13,8 +13,17 @@ BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 # In production, set this as an environment variable
 SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production-2026'
 
-# Database configuration
-DATABASE_PATH = os.path.join(BASE_DIR, 'reviews_app.db')
+# Database configuration (DATABASE_PATH in the environment points the app at
+# another file, e.g. a benchmark dataset)
+DATABASE_PATH = os.environ.get('DATABASE_PATH') or os.path.join(BASE_DIR, 'reviews_app.db')
+
+# SQLite connection tuning (applied to every pooled connection)
+DB_POOL_SIZE = 8  # Idle connections kept for reuse between requests
+SQLITE_JOURNAL_MODE = 'WAL'  # Readers no longer block the writer
+SQLITE_BUSY_TIMEOUT_MS = 5000  # Wait this long for a lock before failing
+SQLITE_SYNCHRONOUS = 'NORMAL'  # Safe with WAL, avoids an fsync per commit
+SQLITE_CACHE_SIZE = -16000  # Page cache per connection (negative = KiB)
+SQLITE_MMAP_SIZE = 64 * 1024 * 1024  # Memory-map up to 64 MB of the database file
 
 # Session configuration
 SESSION_COOKIE_NAME = 'review_app_session'
@@ -34,6 +43,136 @@ SECURITY_HEADERS = {
 
 # Bcrypt configuration
 BCRYPT_LOG_ROUNDS = 12  # Number of hashing rounds (higher = more secure but slower)
+# Existing hashes with a different cost are re-hashed at the next successful login
+BCRYPT_WORKERS = 2  # Hashes computed in parallel (each uses one core for ~250 ms)
+BCRYPT_MAX_PENDING = 8  # Hashes allowed to wait for a worker before returning 503
+
+# Login throttling (failed attempts are limited before bcrypt runs)
+LOGIN_THROTTLE_ENABLED = True
+LOGIN_THROTTLE_WINDOW = 300  # Seconds of failure history per username/IP
+LOGIN_THROTTLE_USERNAME_LIMIT = 5  # Failures per username within the window before lockout
+LOGIN_THROTTLE_IP_LIMIT = 20  # Failures per IP address within the window before lockout
+LOGIN_THROTTLE_BASE_LOCKOUT = 30  # Seconds of the first lockout; doubles on each repeat
+LOGIN_THROTTLE_MAX_LOCKOUT = 3600  # Longest lockout in seconds
+LOGIN_THROTTLE_MAX_ENTRIES = 100000  # Keys kept in memory before the least recent is evicted
+LOGIN_THROTTLE_BACKEND = 'memory'  # 'memory' (per process) or 'sqlite' (shared by all workers)
+# The per-IP limit keys on the client address, which is only the real client
+# when TRUSTED_PROXY_COUNT is right; otherwise every login shares the proxy's
+# address and one attacker locks everyone out. Turn it off if unsure.
+LOGIN_THROTTLE_BY_IP = os.environ.get('LOGIN_THROTTLE_BY_IP', '1') == '1'
+
+# Reverse proxies in front of the app that append to X-Forwarded-For and set
+# X-Forwarded-Proto (0 = clients connect directly; the headers are ignored)
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', '0'))
+
+# Pagination settings
+REVIEWS_PER_PAGE = 20  # Reviews shown per page on listing pages
+MAX_REVIEWS_PER_PAGE = 100  # Upper bound for any caller-supplied page size
+
+# Full-text search settings
+SEARCH_MAX_TERMS = 10  # Words of a query that are used for matching
+SEARCH_SNIPPET_TOKENS = 24  # Length of the highlighted excerpt in each result
+
+# Incremental sync (/api/sync)
+SYNC_PAGE_SIZE = 500  # Change log entries per sync response
+SYNC_MAX_PAGE_SIZE = 2000  # Upper limit for ?limit=
+SYNC_TOMBSTONE_RETENTION = 7 * 24 * 3600  # Seconds deletions are kept; older clients resync fully
+SYNC_COMPACT_INTERVAL = 3600  # Seconds between in-app log compactions (0 = only database/compact_changes.py)
+
+# Result cache for review reads (per process; writes in this process
+# invalidate entries immediately, other workers see them within the TTL)
+RESULT_CACHE_ENABLED = True
+RESULT_CACHE_MAX_ENTRIES = 2048  # Least recently used entries are evicted first
+RESULT_CACHE_TTL = 60  # Seconds before an entry is reloaded from the database
+
+# Rendered HTML fragment cache for collection tiles and review cards
+# (review writes drop affected fragments; the TTL covers poster file changes)
+FRAGMENT_CACHE_ENABLED = True
+FRAGMENT_CACHE_MAX_ENTRIES = 4096  # Least recently used fragments are evicted first
+FRAGMENT_CACHE_TTL = 300  # Seconds before a fragment is rendered again
+
+# Seconds between checks of the posters directory for added/removed files
+POSTER_INDEX_CHECK_INTERVAL = 5
+
+# Resized JPEG/WebP poster copies and blurred placeholders (see utils/posters.py)
+POSTER_DERIVATIVES_ENABLED = True
+POSTER_DERIVATIVES_GENERATE = True  # Create missing copies at startup (needs Pillow; else `flask assets posters`)
+POSTER_DERIVATIVE_DIR = 'images/poster-cache'  # Relative to the static folder
+POSTER_WIDTHS = (160, 240, 320)  # Pixel widths offered in srcset (posters display at 120-210 CSS px)
+POSTER_QUALITY = 78  # JPEG/WebP quality of the resized copies
+
+# Answer repeat GETs of the home, title and review pages with 304 Not Modified
+# when their data version is unchanged (see models/versions.py)
+CONDITIONAL_GET_ENABLED = True
+
+# Seconds browsers and shared caches may reuse a page served without a session
+# (pages for logged-in users are always private and revalidated)
+ANONYMOUS_CACHE_MAX_AGE = 60
+
+# Static asset fingerprinting: url_for('static', ...) adds ?v=<content hash>,
+# and versioned URLs are served as immutable (see utils/assets.py)
+ASSET_FINGERPRINTING_ENABLED = True
+ASSET_MANIFEST_PATH = os.path.join(BASE_DIR, 'asset-manifest.json')  # Written by `flask assets build`; hashed at startup if missing
+ASSET_HASH_LENGTH = 12  # Hex characters of the SHA-256 kept in URLs
+ASSET_MAX_AGE = 365 * 24 * 3600  # Seconds browsers keep a versioned asset (1 year)
+ASSET_EXCLUDE = ('*README.md', '*.gz', '*.br')  # Static files left out of the manifest
+SERVICE_WORKER_PRECACHE = ('css/*', 'js/*', 'manifest.json')  # Assets the service worker stores on install
+
+# Response compression (see middleware/compression.py); brotli is used
+# instead of gzip when the optional brotli package is installed
+COMPRESSION_ENABLED = True
+COMPRESSION_LEVEL = 6  # gzip level 1-9 (6 is zlib's default speed/size balance)
+COMPRESSION_BROTLI_QUALITY = 4  # brotli quality 0-11 for responses compressed per request
+COMPRESSION_MIN_SIZE = 1024  # Bytes below which a response is sent uncompressed
+COMPRESSION_MIMETYPES = ('text/html', 'application/json', 'text/css', 'text/javascript',
+                         'application/javascript', 'image/svg+xml', 'text/plain')
+# Static files get .gz/.br siblings from `flask assets compress`, served by Accept-Encoding
+PRECOMPRESSED_ASSETS_ENABLED = True
+PRECOMPRESS_PATTERNS = ('*.css', '*.js', '*.json', '*.svg')
+
+# Prometheus metrics at /metrics (see utils/metrics.py)
+METRICS_ENABLED = True
+METRICS_ALLOWED_IPS = ('127.0.0.1', '::1')  # Addresses allowed to scrape (None = any)
+# Directory shared by all worker processes; when set, each worker saves its
+# samples there and /metrics reports the sum over every worker (empty it on deploy)
+METRICS_MULTIPROCESS_DIR = os.environ.get('METRICS_MULTIPROCESS_DIR')
+METRICS_SNAPSHOT_INTERVAL = 5  # Seconds between a worker's snapshots in multiprocess mode
+
+# Logging (model errors, slow and repeated SQL)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+
+# SQL tracing: each request records its statements (see utils/sql_trace.py)
+SQL_TRACE_ENABLED = True
+SQL_SLOW_QUERY_MS = 100  # Statements slower than this are logged with their query plan
+SQL_REPEATED_QUERY_THRESHOLD = 5  # Runs of one statement shape per request before an N+1 warning
+
+# Request tracing (see utils/tracing.py): every response carries a request id;
+# sampled requests are written as OTLP JSON, one trace per line
+TRACING_ENABLED = True
+TRACE_SAMPLE_RATE = 0.01  # Share of requests traced
+# Callers whose traceparent sampled flag is honoured (e.g. an internal gateway).
+# Anyone else's trace id is kept for correlation but TRACE_SAMPLE_RATE decides,
+# so outside clients cannot force every request to be traced.
+TRACE_TRUSTED_CALLERS = ('127.0.0.1', '::1')
+TRACE_FILE = os.path.join(BASE_DIR, 'traces', 'traces.jsonl')
+TRACE_FILE_MAX_BYTES = 10 * 1024 * 1024  # Size at which the file is rotated
+TRACE_FILE_BACKUPS = 5  # Rotated files kept (traces.jsonl.1 ... .5)
+TRACE_SERVICE_NAME = 'review-app'
+REQUEST_ID_HEADER = 'X-Request-ID'  # Taken from the request if present, else generated
+
+# Users allowed to reach admin-only routes (comma-separated in the environment)
+ADMIN_USERNAMES = tuple(
+    name.strip() for name in os.environ.get('ADMIN_USERNAMES', '').split(',') if name.strip()
+)
+
+# /debug/profile and /debug/memory (see routes/debug.py); not registered unless enabled
+DEBUG_ENDPOINTS_ENABLED = os.environ.get('DEBUG_ENDPOINTS_ENABLED') == '1'
+DEBUG_PROFILE_INTERVAL = 0.005  # Seconds between stack samples (200 Hz)
+DEBUG_PROFILE_MAX_SECONDS = 60  # Longest profile or memory trace one request may take
+DEBUG_TRACEMALLOC_FRAMES = 10  # Frames stored per allocation while tracemalloc runs
+
+# Listing pages are streamed; rendered HTML is sent in chunks of about this many characters
+TEMPLATE_STREAM_BUFFER = 2048
 
 # Application settings
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max request size
@@ -0,0 +1,543 @@
+"""
+Bulk Import/Export Script
+Streams reviews and users between the database and CSV/JSONL files
+
+Usage:
+    python database/bulk.py import-reviews reviews.csv [--batch-size 5000] [--escaped]
+    python database/bulk.py import-users users.jsonl [--workers 4]
+    python database/bulk.py export-reviews reviews.jsonl
+
+Imports validate every record with utils/validators.py and insert them with
+executemany in batched transactions. Each batch commits together with a
+checkpoint in the import_checkpoints table, so re-running an interrupted
+import resumes after the last committed record (--restart starts over).
+Review imports drop the indexes for the load and rebuild them at the end;
+if the process is killed before that, run database/rebuild_search.py.
+The file format follows the extension (.csv, .jsonl/.ndjson) or --format.
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+# Add parent directory to path to import config
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config
+from models.db import init_schema, get_db_connection, release_db_connection, rebuild_search_index
+from utils.validators import (validate_username, validate_email, validate_password,
+                              validate_title, validate_review_text, validate_rating,
+                              validate_category)
+from utils.security import sanitize_input
+from models.versions import GLOBAL_SCOPE, bump_versions, title_scope
+
+# Columns written by export-reviews (and accepted by import-reviews)
+REVIEW_FIELDS = ['id', 'username', 'user_id', 'title', 'review_text', 'rating',
+                 'category', 'review_date', 'updated_at']
+
+# Rejected records printed individually before only the count is reported
+MAX_REPORTED_REJECTS = 20
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 1.0
+
+# Page cache for the import connection (negative = KiB), large enough to keep
+# the growing table's hot pages in memory
+IMPORT_CACHE_SIZE = -262144  # 256 MB
+
+class InvalidRecord(ValueError):
+    """A record that fails validation; the message says why"""
+
+# === Reading and writing files ===
+
+def detect_format(path, requested=None):
+    """Return 'csv' or 'jsonl' from --format or the file extension"""
+    if requested:
+        return requested
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.jsonl', '.ndjson', '.json'):
+        return 'jsonl'
+    return 'csv'
+
+def read_records(path, file_format):
+    """
+    Yield one dict per input record without loading the whole file
+
+    A JSONL line that is not valid JSON is yielded as an InvalidRecord
+    instead, so it is counted with the other rejects (see require_object())
+    and the import and its checkpoint move past it.
+
+    Args:
+        path (str): Input file
+        file_format (str): 'csv' (with a header row) or 'jsonl'
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as source:
+        if file_format == 'csv':
+            yield from csv.DictReader(source)
+        else:
+            for line in source:
+                line = line.strip()
+                if line:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield InvalidRecord(f"Invalid JSON: {e}")
+
+def require_object(record):
+    """
+    Return a record from read_records() if it is a JSON object / CSV row
+
+    Raises:
+        InvalidRecord: For a line that did not parse or is not an object
+    """
+    if isinstance(record, InvalidRecord):
+        raise record
+    if not isinstance(record, dict):
+        raise InvalidRecord(f"Expected an object, got {type(record).__name__}")
+    return record
+
+class RecordWriter:
+    """Write dicts to a CSV or JSONL stream one at a time"""
+
+    def __init__(self, stream, file_format, fields):
+        self.stream = stream
+        self.file_format = file_format
+        if file_format == 'csv':
+            self._csv = csv.DictWriter(stream, fieldnames=fields)
+            self._csv.writeheader()
+
+    def write(self, record):
+        if self.file_format == 'csv':
+            self._csv.writerow(record)
+        else:
+            self.stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+# === Progress and checkpoints ===
+
+class Progress:
+    """Prints throughput at most once per PROGRESS_INTERVAL seconds"""
+
+    def __init__(self, label, start_records=0, stream=None):
+        """
+        Args:
+            label (str): Name printed with each line
+            start_records (int): Records already done by an earlier run
+            stream (file, optional): Where lines go (default: stdout)
+        """
+        self.label = label
+        self.stream = stream
+        self.records = start_records
+        self.written = 0
+        self.rejected = 0
+        self._started = time.perf_counter()
+        self._start_records = start_records
+        self._last_report = self._started
+
+    def update(self, records, written):
+        self.records += records
+        self.written += written
+        now = time.perf_counter()
+        if now - self._last_report >= PROGRESS_INTERVAL:
+            self._last_report = now
+            self.report()
+
+    def report(self, final=False):
+        elapsed = time.perf_counter() - self._started
+        rate = (self.records - self._start_records) / elapsed if elapsed else 0.0
+        prefix = '[OK]' if final else '[..]'
+        print(f"{prefix} {self.label}: {self.records:,} records read, {self.written:,} written, "
+              f"{self.rejected:,} rejected ({rate:,.0f} records/s, {elapsed:.1f}s)",
+              file=self.stream or sys.stdout, flush=True)
+
+    def reject(self, record_number, error):
+        """Count a rejected record (only the first few are printed)"""
+        if self.rejected < MAX_REPORTED_REJECTS:
+            print(f"[SKIP] record {record_number}: {error}")
+        elif self.rejected == MAX_REPORTED_REJECTS:
+            print("[SKIP] further rejected records are counted but not listed")
+        self.rejected += 1
+
+def checkpoint_source(kind, path):
+    """Checkpoint key for an input file"""
+    return f'{kind}:{os.path.abspath(path)}'
+
+def file_fingerprint(path):
+    """Identify the file's contents well enough to refuse resuming a changed file"""
+    stat = os.stat(path)
+    return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+def load_checkpoint(conn, source, fingerprint, restart):
+    """
+    Find where a previous run of this import stopped
+
+    Returns:
+        tuple: (records already consumed, completed flag)
+    """
+    if restart:
+        with conn:
+            conn.execute("DELETE FROM import_checkpoints WHERE source = ?", (source,))
+        return 0, False
+
+    row = conn.execute(
+        "SELECT fingerprint, records, completed FROM import_checkpoints WHERE source = ?",
+        (source,)
+    ).fetchone()
+    if row is None:
+        return 0, False
+    if row['fingerprint'] != fingerprint:
+        raise SystemExit(
+            f"Error: {source.split(':', 1)[1]} changed since it was partially imported. "
+            "Use --restart to import it from the beginning."
+        )
+    return row['records'], bool(row['completed'])
+
+def save_checkpoint(conn, source, fingerprint, records, completed=False):
+    """Record progress (call inside the batch's transaction)"""
+    conn.execute(
+        """INSERT INTO import_checkpoints (source, fingerprint, records, completed, updated_at)
+           VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+           ON CONFLICT(source) DO UPDATE SET
+               records = excluded.records,
+               completed = excluded.completed,
+               updated_at = excluded.updated_at""",
+        (source, fingerprint, records, int(completed))
+    )
+
+def batches(records, size):
+    """Split an iterator of records into lists of at most `size`"""
+    while True:
+        batch = list(islice(records, size))
+        if not batch:
+            return
+        yield batch
+
+# === Reviews ===
+
+def parse_review_date(value):
+    """Normalise a timestamp to SQLite's 'YYYY-MM-DD HH:MM:SS' (None for the current time)"""
+    if value in (None, ''):
+        return None
+    try:
+        return datetime.fromisoformat(str(value)).strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        raise InvalidRecord(f"Invalid review_date: {value!r}")
+
+def review_row(record, user_ids, known_ids, escaped):
+    """
+    Validate one review record and build its INSERT parameters
+
+    Args:
+        record (dict): Input record
+        user_ids (dict): username -> user id for every existing user
+        known_ids (set): Every existing user id
+        escaped (bool): Text is already HTML-escaped as stored (e.g. from export-reviews)
+
+    Returns:
+        tuple: (user_id, title, review_text, rating, category, review_date)
+    """
+    record = require_object(record)
+    username = record.get('username')
+    if username:
+        user_id = user_ids.get(username)
+        if user_id is None:
+            raise InvalidRecord(f"Unknown username: {username!r}")
+    else:
+        try:
+            user_id = int(record.get('user_id'))
+        except (TypeError, ValueError):
+            raise InvalidRecord("A username or user_id is required")
+        if user_id not in known_ids:
+            raise InvalidRecord(f"Unknown user_id: {user_id}")
+
+    title = str(record.get('title') or '').strip()
+    review_text = str(record.get('review_text') or '').strip()
+    rating = record.get('rating')
+    category = record.get('category')
+
+    # Validate the text as it will be stored: escaping lengthens & < > " ',
+    # and the table's length CHECKs would otherwise fail the whole batch
+    if not escaped:
+        title = sanitize_input(title)
+        review_text = sanitize_input(review_text)
+
+    for valid, error in (validate_title(title), validate_category(category),
+                         validate_rating(rating), validate_review_text(review_text)):
+        if not valid:
+            raise InvalidRecord(error)
+
+    return (user_id, title, review_text, int(rating), category,
+            parse_review_date(record.get('review_date')))
+
+def suspend_review_indexes(conn):
+    """
+    Drop the reviews indexes and the full-text insert trigger before a bulk load
+
+    Keeping six indexes and the FTS index up to date row by row makes every
+    insert touch random pages; building them once after the load is several
+    times faster. restore_review_indexes() puts them back from schema.sql.
+    """
+    names = [row['name'] for row in conn.execute(
+        """SELECT name FROM sqlite_master
+           WHERE type = 'index' AND tbl_name = 'reviews' AND name LIKE 'idx_%'"""
+    )]
+    with conn:
+        for name in names:
+            conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+        conn.execute("DROP TRIGGER IF EXISTS trg_reviews_fts_insert")
+
+def restore_review_indexes(conn):
+    """Recreate the indexes and trigger from schema.sql and reindex the search table"""
+    print("Rebuilding indexes and the search index...", flush=True)
+    started = time.perf_counter()
+    init_schema()
+    rebuild_search_index(conn)
+    print(f"[OK] Indexes rebuilt in {time.perf_counter() - started:.1f}s")
+
+def import_reviews(path, file_format, batch_size, escaped, restart, keep_indexes):
+    """
+    Import reviews from a CSV/JSONL file
+
+    Unless keep_indexes is set, the indexes are dropped for the load and
+    rebuilt at the end (also after an error or Ctrl+C). Use keep_indexes
+    while the app is serving the same database.
+    """
+    conn = get_db_connection()
+    source = checkpoint_source('reviews', path)
+    fingerprint = file_fingerprint(path)
+    skip, completed = load_checkpoint(conn, source, fingerprint, restart)
+    if completed:
+        print(f"[OK] {path} was already imported (use --restart to import it again)")
+        return
+
+    # Users are few compared to reviews, so resolve usernames from memory
+    user_ids = {row['username']: row['id'] for row in conn.execute("SELECT id, username FROM users")}
+    known_ids = set(user_ids.values())
+
+    if skip:
+        print(f"Resuming {path} after record {skip:,}")
+    records = islice(read_records(path, file_format), skip, None)
+    progress = Progress('reviews', start_records=skip)
+
+    conn.execute(f"PRAGMA cache_size = {IMPORT_CACHE_SIZE}")
+    if not keep_indexes:
+        suspend_review_indexes(conn)
+    try:
+        for batch in batches(records, batch_size):
+            rows = []
+            for record_number, record in enumerate(batch, start=progress.records + 1):
+                try:
+                    rows.append(review_row(record, user_ids, known_ids, escaped))
+                except InvalidRecord as e:
+                    progress.reject(record_number, e)
+
+            with conn:
+                conn.executemany(
+                    """INSERT INTO reviews (user_id, title, review_text, rating, category, review_date)
+                       VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))""",
+                    rows
+                )
+                if rows:
+                    # Cached pages for the imported titles (and the home page) are now stale
+                    bump_versions(conn, [GLOBAL_SCOPE, *{title_scope(row[1]) for row in rows}])
+                save_checkpoint(conn, source, fingerprint, progress.records + len(batch))
+            progress.update(len(batch), len(rows))
+
+        with conn:
+            save_checkpoint(conn, source, fingerprint, progress.records, completed=True)
+        progress.report(final=True)
+    finally:
+        conn.execute(f"PRAGMA cache_size = {int(config.SQLITE_CACHE_SIZE)}")
+        if not keep_indexes:
+            restore_review_indexes(conn)
+
+# === Users ===
+
+def _hash_password(password):
+    """Hash one password (runs in a worker process)"""
+    import bcrypt
+    return bcrypt.hashpw(password.encode('utf-8'),
+                         bcrypt.gensalt(rounds=config.BCRYPT_LOG_ROUNDS)).decode('utf-8')
+
+def user_row(record):
+    """
+    Validate one user record
+
+    Records carry either a plain 'password' (hashed during import) or an
+    existing bcrypt 'password_hash'.
+
+    Returns:
+        tuple: (username, email, password or hash, needs_hashing)
+    """
+    record = require_object(record)
+    # Validated as stored (escaped), like review_row()
+    username = sanitize_input(str(record.get('username') or '').strip())
+    email = sanitize_input(str(record.get('email') or '').strip())
+    password_hash = record.get('password_hash')
+
+    for valid, error in (validate_username(username), validate_email(email)):
+        if not valid:
+            raise InvalidRecord(error)
+
+    if password_hash:
+        if not isinstance(password_hash, str) or len(password_hash) != 60 or not password_hash.startswith('$2'):
+            raise InvalidRecord("password_hash is not a bcrypt hash")
+        return username, email, password_hash, False
+
+    password = str(record.get('password') or '')
+    valid, error = validate_password(password)
+    if not valid:
+        raise InvalidRecord(error)
+    return username, email, password, True
+
+def import_users(path, file_format, batch_size, workers, restart):
+    """Import users from a CSV/JSONL file, hashing passwords in a process pool"""
+    conn = get_db_connection()
+    source = checkpoint_source('users', path)
+    fingerprint = file_fingerprint(path)
+    skip, completed = load_checkpoint(conn, source, fingerprint, restart)
+    if completed:
+        print(f"[OK] {path} was already imported (use --restart to import it again)")
+        return
+
+    if skip:
+        print(f"Resuming {path} after record {skip:,}")
+    records = islice(read_records(path, file_format), skip, None)
+    progress = Progress('users', start_records=skip)
+
+    # Each hash takes ~250 ms at the default cost, so hashing dominates;
+    # spread it over every core and keep batches small enough to checkpoint often
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for batch in batches(records, batch_size):
+            rows = []
+            for record_number, record in enumerate(batch, start=progress.records + 1):
+                try:
+                    rows.append(user_row(record))
+                except InvalidRecord as e:
+                    progress.reject(record_number, e)
+
+            plain = [row[2] for row in rows if row[3]]
+            hashes = iter(executor.map(_hash_password, plain,
+                                       chunksize=max(1, len(plain) // (workers * 4))))
+            rows = [(username, email, next(hashes) if needs_hashing else secret)
+                    for username, email, secret, needs_hashing in rows]
+
+            with conn:
+                before = conn.total_changes
+                conn.executemany(
+                    """INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)
+                       ON CONFLICT DO NOTHING""",
+                    rows
+                )
+                inserted = conn.total_changes - before
+                save_checkpoint(conn, source, fingerprint, progress.records + len(batch))
+
+            duplicates = len(rows) - inserted
+            if duplicates:
+                print(f"[SKIP] {duplicates} users in records {progress.records + 1}-"
+                      f"{progress.records + len(batch)} already exist (username or email taken)")
+                progress.rejected += duplicates
+            progress.update(len(batch), inserted)
+
+    with conn:
+        save_checkpoint(conn, source, fingerprint, progress.records, completed=True)
+    progress.report(final=True)
+
+# === Export ===
+
+def export_reviews(path, file_format, batch_size):
+    """Stream every review, oldest id first, to a CSV/JSONL file ('-' for stdout)"""
+    conn = get_db_connection()
+    cursor = conn.execute(
+        """SELECT r.id, u.username, r.user_id, r.title, r.review_text, r.rating,
+                  r.category, r.review_date, r.updated_at
+           FROM reviews r
+           JOIN users u ON r.user_id = u.id
+           ORDER BY r.id"""
+    )
+
+    stream = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+    # Progress goes to stderr when the data itself goes to stdout
+    progress = Progress('export', stream=sys.stderr if path == '-' else None)
+    try:
+        writer = RecordWriter(stream, file_format, REVIEW_FIELDS)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                writer.write(dict(row))
+            progress.update(len(rows), len(rows))
+    finally:
+        if stream is not sys.stdout:
+            stream.close()
+    progress.report(final=True)
+
+# === Command line ===
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Bulk import/export for the review database")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    reviews = commands.add_parser('import-reviews', help="Import reviews from CSV/JSONL")
+    reviews.add_argument('path')
+    reviews.add_argument('--escaped', action='store_true',
+                         help="Text is already HTML-escaped as stored (e.g. from export-reviews)")
+    reviews.add_argument('--keep-indexes', action='store_true',
+                         help="Maintain indexes during the load (slower; use while the app is running)")
+
+    users = commands.add_parser('import-users', help="Import users from CSV/JSONL")
+    users.add_argument('path')
+    users.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                       help="Processes used for password hashing (default: one per CPU)")
+
+    export = commands.add_parser('export-reviews', help="Export reviews to CSV/JSONL ('-' for stdout)")
+    export.add_argument('path')
+
+    for command, default_batch in ((reviews, 5000), (users, 256), (export, 5000)):
+        command.add_argument('--format', choices=['csv', 'jsonl'],
+                             help="File format (default: from the file extension)")
+        command.add_argument('--batch-size', type=int, default=default_batch,
+                             help=f"Records per transaction (default: {default_batch})")
+    for command in (reviews, users):
+        command.add_argument('--restart', action='store_true',
+                             help="Ignore any checkpoint and import the whole file again")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    if not os.path.exists(config.DATABASE_PATH):
+        print(f"Error: Database not found at {config.DATABASE_PATH}")
+        print("Please run init_db.py first")
+        return 1
+
+    # Make sure the checkpoint table (and everything else) exists
+    init_schema()
+
+    file_format = detect_format(args.path, args.format)
+    try:
+        if args.command == 'import-reviews':
+            import_reviews(args.path, file_format, args.batch_size, args.escaped, args.restart,
+                           args.keep_indexes)
+        elif args.command == 'import-users':
+            import_users(args.path, file_format, args.batch_size, args.workers, args.restart)
+        else:
+            export_reviews(args.path, file_format, args.batch_size)
+    except KeyboardInterrupt:
+        print("\nInterrupted; run the same command again to resume")
+        return 130
+    except BrokenPipeError:
+        # Exported to stdout and the reader (e.g. head) closed the pipe
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    finally:
+        release_db_connection()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+Query Plan Check
+Runs every model query against a scratch database and fails if SQLite plans
+a full table scan or a temporary B-tree sort for any of them.
+
+Usage:
+    python database/check_query_plans.py
+
+Exits with status 1 if any query has a bad plan, so it can run in CI.
+"""
+
+import os
+import re
+import sys
+import tempfile
+
+# Add parent directory to path to import config
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config
+
+# Point the models at a scratch database, bypass the result cache so every
+# call reaches SQLite, and keep password hashing cheap
+_scratch_dir = tempfile.TemporaryDirectory()
+config.DATABASE_PATH = os.path.join(_scratch_dir.name, 'plans.db')
+config.RESULT_CACHE_ENABLED = False
+config.BCRYPT_LOG_ROUNDS = 4
+
+from models import changes, review, user, versions
+from models.db import init_schema, get_db_connection, release_db_connection
+
+# Plan steps that fail the check: any SCAN walks the whole table or index
+# (with or without USING INDEX), and a temp B-tree means an explicit sort
+FLAGGED_STEP = re.compile(r'^SCAN |USE TEMP B-TREE')
+
+# (plan step, statement) pairs that are expected to be flagged, with the reason
+ALLOWED = [
+    # The unfiltered listing walks the date index newest first and stops at LIMIT
+    (re.compile(r'^SCAN reviews USING INDEX idx_reviews_review_date$'),
+     re.compile(r'WHERE 1=1 (ORDER BY|AND \(reviews\.review_date)')),
+    # The collection shows every title, in display order
+    (re.compile(r'^SCAN ts USING INDEX idx_title_stats_order$'),
+     re.compile(r'FROM title_stats ts')),
+    # FTS5 resolves MATCH inside the virtual table; bm25() is only known per
+    # match, so the (already MATCH-restricted) results have to be sorted
+    (re.compile(r'^SCAN reviews_fts VIRTUAL TABLE'), re.compile(r'FROM reviews_fts')),
+    (re.compile(r'^USE TEMP B-TREE FOR ORDER BY$'), re.compile(r'FROM reviews_fts')),
+    # SQLite's sequence table has one row per AUTOINCREMENT table
+    (re.compile(r'^SCAN sqlite_sequence$'), re.compile(r'FROM sqlite_sequence')),
+    # FTS5 reads its own one-row configuration table
+    (re.compile(r'^SCAN (main\.)?reviews_fts_config$'), re.compile(r'reviews_fts_config')),
+]
+
+def exercise_models():
+    """Call every model function with representative arguments"""
+    user_id = user.create_user('plan_check', 'plan@example.com', 'PlanCheck123!')
+    other_id = user.create_user('plan_other', 'other@example.com', 'PlanCheck123!')
+    user.get_user_by_username('plan_check')
+    user.get_user_by_email('plan@example.com')
+    user.get_user_by_id(user_id)
+    user.verify_user_password('plan_check', 'PlanCheck123!')
+
+    ids = []
+    for i in range(30):
+        ids.append(review.create_review(
+            user_id=user_id if i % 2 else other_id,
+            title=f'Title {i % 4}',
+            review_text=f'Review number {i} with enough text to be valid.',
+            rating=i % 5 + 1,
+            category='game' if i % 3 else 'movie'
+        ))
+
+    for category in (None, 'game'):
+        for rating in (None, 5):
+            first = review.get_all_reviews(category=category, rating=rating, limit=3)
+            second = review.get_all_reviews(category=category, rating=rating,
+                                            after=first['next_cursor'], limit=3)
+            review.get_all_reviews(category=category, rating=rating,
+                                   before=second['prev_cursor'], limit=3)
+
+    first = review.get_reviews_by_title('Title 1', limit=2)
+    second = review.get_reviews_by_title('Title 1', after=first['next_cursor'], limit=2)
+    review.get_reviews_by_title('Title 1', before=second['prev_cursor'], limit=2)
+    review.count_reviews_by_title('Title 1')
+    review.get_title_stats('Title 1')
+
+    first = review.get_reviews_by_user_id(user_id, limit=2)
+    second = review.get_reviews_by_user_id(user_id, after=first['next_cursor'], limit=2)
+    review.get_reviews_by_user_id(user_id, before=second['prev_cursor'], limit=2)
+    review.count_reviews_by_user_id(user_id)
+
+    review.get_collection_items()
+    review.get_review_by_id(ids[0])
+    review.check_review_ownership(ids[0], user_id)
+
+    first = review.search_reviews('review text', limit=2)
+    review.search_reviews('review', category='game', rating=5, cursor=first['next_cursor'])
+
+    first = changes.get_changes_since(0, limit=5)
+    changes.get_changes_since(first['cursor'])
+
+    versions.get_data_versions([versions.GLOBAL_SCOPE, versions.title_scope('Title 1'),
+                                versions.review_scope(ids[0])])
+
+    review.update_review(ids[0], 'Title 9', 'Updated text for the plan check.', 4, 'movie')
+    review.delete_review(ids[1])
+
+def capture_statements():
+    """
+    Run the models with a trace callback and collect the SQL they execute
+
+    Returns:
+        list: Distinct statements with their parameters already bound
+    """
+    statements = []
+    conn = get_db_connection()
+    conn.set_trace_callback(statements.append)
+    try:
+        exercise_models()
+    finally:
+        conn.set_trace_callback(None)
+
+    seen = set()
+    distinct = []
+    for sql in statements:
+        sql = sql.strip()
+        if not re.match(r'(SELECT|UPDATE|DELETE|INSERT)\b', sql, re.IGNORECASE):
+            continue  # PRAGMAs, BEGIN/COMMIT and "-- TRIGGER" markers
+        shape = statement_shape(sql)
+        if shape not in seen:
+            seen.add(shape)
+            distinct.append(sql)
+    return distinct
+
+def statement_shape(sql):
+    """Replace literals with ? so repeated calls of one query compare equal"""
+    shape = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    shape = re.sub(r'\b\d+(?:\.\d+)?(?:e[-+]?\d+)?\b', '?', shape, flags=re.IGNORECASE)
+    return ' '.join(shape.split())
+
+def plan_problems(conn, sql):
+    """
+    Explain one statement and list the plan steps that fail the check
+
+    Returns:
+        tuple: (plan lines, problem lines)
+    """
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    flat_sql = ' '.join(sql.split())
+    problems = []
+    for step in plan:
+        if not FLAGGED_STEP.search(step):
+            continue
+        if any(step_re.search(step) and sql_re.search(flat_sql) for step_re, sql_re in ALLOWED):
+            continue
+        problems.append(step)
+    return plan, problems
+
+def check_query_plans():
+    """Check every captured statement and report the result"""
+    init_schema()
+    statements = capture_statements()
+    conn = get_db_connection()
+
+    failures = 0
+    for sql in statements:
+        plan, problems = plan_problems(conn, sql)
+        summary = ' '.join(sql.split())[:100]
+        if problems:
+            failures += 1
+            print(f"[FAIL] {summary}")
+            for step in plan:
+                print(f"         {step}")
+        else:
+            print(f"[OK]   {summary}")
+
+    release_db_connection()
+    print(f"\nChecked {len(statements)} statements, {failures} with bad plans")
+    return failures == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if check_query_plans() else 1)
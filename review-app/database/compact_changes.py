@@ -0,0 +1,33 @@
+"""
+Change Log Compaction Script
+Shrinks the review_changes log behind /api/sync (run from cron, or let the
+app do it every SYNC_COMPACT_INTERVAL seconds)
+"""
+
+import os
+import sys
+
+# Add parent directory to path to import config
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config
+from models.db import init_schema, release_db_connection
+from models.changes import compact_review_changes
+
+def compact():
+    """Compact the review change log"""
+
+    if not os.path.exists(config.DATABASE_PATH):
+        print(f"Error: Database not found at {config.DATABASE_PATH}")
+        print("Please run init_db.py first")
+        return
+
+    init_schema()
+    try:
+        removed = compact_review_changes()
+        if removed is not None:
+            print(f"[OK] Removed {removed} change log entries")
+    finally:
+        release_db_connection()
+
+if __name__ == "__main__":
+    compact()
@@ -0,0 +1,39 @@
+"""
+Search Index Rebuild Script
+Repopulates the reviews_fts full-text index from the reviews table
+"""
+
+import os
+import sys
+import time
+
+# Add parent directory to path to import config
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import config
+from models.db import init_schema, get_db_connection, rebuild_search_index, release_db_connection
+
+def rebuild():
+    """Rebuild and optimize the full-text search index"""
+
+    if not os.path.exists(config.DATABASE_PATH):
+        print(f"Error: Database not found at {config.DATABASE_PATH}")
+        print("Please run init_db.py first")
+        return
+
+    # Make sure the index and its triggers exist
+    init_schema()
+
+    conn = get_db_connection()
+    try:
+        print(f"Rebuilding search index in: {config.DATABASE_PATH}")
+        started = time.perf_counter()
+        rebuild_search_index(conn)
+        with conn:
+            conn.execute("INSERT INTO reviews_fts (reviews_fts) VALUES ('optimize')")
+        count = conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+        print(f"[OK] Indexed {count} reviews in {time.perf_counter() - started:.2f}s")
+    finally:
+        release_db_connection()
+
+if __name__ == "__main__":
+    rebuild()
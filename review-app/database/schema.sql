@@ -26,8 +26,291 @@ CREATE TABLE IF NOT EXISTS reviews (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
--- Indexes for performance optimization
-CREATE INDEX IF NOT EXISTS idx_reviews_user_id ON reviews(user_id);
-CREATE INDEX IF NOT EXISTS idx_reviews_category ON reviews(category);
-CREATE INDEX IF NOT EXISTS idx_reviews_rating ON reviews(rating);
-CREATE INDEX IF NOT EXISTS idx_reviews_date ON reviews(review_date DESC);
+-- Indexes matching the model queries' access paths. Listings filter on one
+-- or two columns and page newest first on (review_date, id); each index
+-- ends in review_date (and implicitly the rowid), so SQLite walks it backwards
+-- for "ORDER BY review_date DESC, id DESC" without a sort step.
+-- Verify with: python database/check_query_plans.py
+DROP INDEX IF EXISTS idx_reviews_user_id;
+DROP INDEX IF EXISTS idx_reviews_category;
+DROP INDEX IF EXISTS idx_reviews_rating;
+DROP INDEX IF EXISTS idx_reviews_date;
+CREATE INDEX IF NOT EXISTS idx_reviews_title_date ON reviews(title, review_date);
+CREATE INDEX IF NOT EXISTS idx_reviews_user_date ON reviews(user_id, review_date);
+CREATE INDEX IF NOT EXISTS idx_reviews_category_rating_date ON reviews(category, rating, review_date);
+CREATE INDEX IF NOT EXISTS idx_reviews_category_date ON reviews(category, review_date);
+CREATE INDEX IF NOT EXISTS idx_reviews_rating_date ON reviews(rating, review_date);
+CREATE INDEX IF NOT EXISTS idx_reviews_review_date ON reviews(review_date);
+
+-- Display order of titles in the home page collection (Persona series release order).
+-- Titles without an entry are listed after these, alphabetically.
+CREATE TABLE IF NOT EXISTS title_order (
+    title TEXT PRIMARY KEY,
+    position INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO title_order (title, position) VALUES
+    ('Revelations: Persona', 1),
+    ('Persona 2: Innocent Sin', 2),
+    ('Persona 2: Eternal Punishment', 3),
+    ('Persona 3 FES', 4),
+    ('Persona 4 Golden', 5),
+    ('Persona Q: Shadow of the Labyrinth', 6),
+    ('Persona 5 Royal', 7),
+    ('Persona 3 ReLoad', 8);
+
+-- Per-title aggregates for the collection, maintained by the triggers below
+CREATE TABLE IF NOT EXISTS title_stats (
+    title TEXT PRIMARY KEY,
+    display_order INTEGER NOT NULL,
+    review_count INTEGER NOT NULL DEFAULT 0,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    average_rating REAL,
+    rating_1 INTEGER NOT NULL DEFAULT 0,
+    rating_2 INTEGER NOT NULL DEFAULT 0,
+    rating_3 INTEGER NOT NULL DEFAULT 0,
+    rating_4 INTEGER NOT NULL DEFAULT 0,
+    rating_5 INTEGER NOT NULL DEFAULT 0,
+    latest_review_id INTEGER,
+    latest_review_date TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_title_stats_order ON title_stats(display_order, title);
+
+CREATE TRIGGER IF NOT EXISTS trg_reviews_stats_insert
+AFTER INSERT ON reviews
+BEGIN
+    INSERT OR IGNORE INTO title_stats (title, display_order)
+    VALUES (NEW.title, COALESCE((SELECT position FROM title_order WHERE title = NEW.title), 1000000));
+
+    UPDATE title_stats SET
+        review_count = review_count + 1,
+        rating_sum = rating_sum + NEW.rating,
+        average_rating = CAST(rating_sum + NEW.rating AS REAL) / (review_count + 1),
+        rating_1 = rating_1 + (NEW.rating = 1),
+        rating_2 = rating_2 + (NEW.rating = 2),
+        rating_3 = rating_3 + (NEW.rating = 3),
+        rating_4 = rating_4 + (NEW.rating = 4),
+        rating_5 = rating_5 + (NEW.rating = 5),
+        latest_review_id = CASE WHEN latest_review_id IS NULL
+                  OR NEW.review_date > latest_review_date
+                  OR (NEW.review_date = latest_review_date AND NEW.id > latest_review_id)
+            THEN NEW.id ELSE latest_review_id END,
+        latest_review_date = CASE WHEN latest_review_id IS NULL
+                  OR NEW.review_date > latest_review_date
+                  OR (NEW.review_date = latest_review_date AND NEW.id > latest_review_id)
+            THEN NEW.review_date ELSE latest_review_date END
+    WHERE title = NEW.title;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_reviews_stats_delete
+AFTER DELETE ON reviews
+BEGIN
+    UPDATE title_stats SET
+        review_count = review_count - 1,
+        rating_sum = rating_sum - OLD.rating,
+        average_rating = CASE WHEN review_count > 1
+            THEN CAST(rating_sum - OLD.rating AS REAL) / (review_count - 1) END,
+        rating_1 = rating_1 - (OLD.rating = 1),
+        rating_2 = rating_2 - (OLD.rating = 2),
+        rating_3 = rating_3 - (OLD.rating = 3),
+        rating_4 = rating_4 - (OLD.rating = 4),
+        rating_5 = rating_5 - (OLD.rating = 5)
+    WHERE title = OLD.title;
+
+    DELETE FROM title_stats WHERE title = OLD.title AND review_count <= 0;
+
+    UPDATE title_stats SET (latest_review_id, latest_review_date) = (
+        SELECT id, review_date FROM reviews
+        WHERE title = OLD.title
+        ORDER BY review_date DESC, id DESC
+        LIMIT 1
+    )
+    WHERE title = OLD.title AND latest_review_id = OLD.id;
+END;
+
+-- An edit is applied as removing the old row and adding the new one
+CREATE TRIGGER IF NOT EXISTS trg_reviews_stats_update
+AFTER UPDATE OF title, rating, review_date ON reviews
+BEGIN
+    UPDATE title_stats SET
+        review_count = review_count - 1,
+        rating_sum = rating_sum - OLD.rating,
+        average_rating = CASE WHEN review_count > 1
+            THEN CAST(rating_sum - OLD.rating AS REAL) / (review_count - 1) END,
+        rating_1 = rating_1 - (OLD.rating = 1),
+        rating_2 = rating_2 - (OLD.rating = 2),
+        rating_3 = rating_3 - (OLD.rating = 3),
+        rating_4 = rating_4 - (OLD.rating = 4),
+        rating_5 = rating_5 - (OLD.rating = 5)
+    WHERE title = OLD.title;
+
+    DELETE FROM title_stats WHERE title = OLD.title AND review_count <= 0;
+
+    UPDATE title_stats SET (latest_review_id, latest_review_date) = (
+        SELECT id, review_date FROM reviews
+        WHERE title = OLD.title
+        ORDER BY review_date DESC, id DESC
+        LIMIT 1
+    )
+    WHERE title = OLD.title AND latest_review_id = OLD.id;
+
+    INSERT OR IGNORE INTO title_stats (title, display_order)
+    VALUES (NEW.title, COALESCE((SELECT position FROM title_order WHERE title = NEW.title), 1000000));
+
+    UPDATE title_stats SET
+        review_count = review_count + 1,
+        rating_sum = rating_sum + NEW.rating,
+        average_rating = CAST(rating_sum + NEW.rating AS REAL) / (review_count + 1),
+        rating_1 = rating_1 + (NEW.rating = 1),
+        rating_2 = rating_2 + (NEW.rating = 2),
+        rating_3 = rating_3 + (NEW.rating = 3),
+        rating_4 = rating_4 + (NEW.rating = 4),
+        rating_5 = rating_5 + (NEW.rating = 5),
+        latest_review_id = CASE WHEN latest_review_id IS NULL
+                  OR NEW.review_date > latest_review_date
+                  OR (NEW.review_date = latest_review_date AND NEW.id > latest_review_id)
+            THEN NEW.id ELSE latest_review_id END,
+        latest_review_date = CASE WHEN latest_review_id IS NULL
+                  OR NEW.review_date > latest_review_date
+                  OR (NEW.review_date = latest_review_date AND NEW.id > latest_review_id)
+            THEN NEW.review_date ELSE latest_review_date END
+    WHERE title = NEW.title;
+END;
+
+-- Backfill databases created before title_stats existed
+INSERT INTO title_stats (
+    title, display_order, review_count, rating_sum, average_rating,
+    rating_1, rating_2, rating_3, rating_4, rating_5,
+    latest_review_id, latest_review_date
+)
+SELECT r.title,
+       COALESCE(o.position, 1000000),
+       COUNT(*),
+       SUM(r.rating),
+       AVG(r.rating),
+       SUM(r.rating = 1), SUM(r.rating = 2), SUM(r.rating = 3), SUM(r.rating = 4), SUM(r.rating = 5),
+       (SELECT l.id FROM reviews l
+        WHERE l.title = r.title
+        ORDER BY l.review_date DESC, l.id DESC
+        LIMIT 1),
+       MAX(r.review_date)
+FROM reviews r
+LEFT JOIN title_order o ON o.title = r.title
+WHERE NOT EXISTS (SELECT 1 FROM title_stats)
+GROUP BY r.title;
+
+-- Full-text index over review titles and text (external content: rows live in reviews)
+CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5(
+    title,
+    review_text,
+    content='reviews',
+    content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_reviews_fts_insert
+AFTER INSERT ON reviews
+BEGIN
+    INSERT INTO reviews_fts (rowid, title, review_text)
+    VALUES (NEW.id, NEW.title, NEW.review_text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_reviews_fts_delete
+AFTER DELETE ON reviews
+BEGIN
+    INSERT INTO reviews_fts (reviews_fts, rowid, title, review_text)
+    VALUES ('delete', OLD.id, OLD.title, OLD.review_text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_reviews_fts_update
+AFTER UPDATE OF title, review_text ON reviews
+BEGIN
+    INSERT INTO reviews_fts (reviews_fts, rowid, title, review_text)
+    VALUES ('delete', OLD.id, OLD.title, OLD.review_text);
+    INSERT INTO reviews_fts (rowid, title, review_text)
+    VALUES (NEW.id, NEW.title, NEW.review_text);
+END;
+
+-- Failed login counters shared by all workers (config.LOGIN_THROTTLE_BACKEND = 'sqlite')
+CREATE TABLE IF NOT EXISTS login_throttle (
+    key TEXT PRIMARY KEY,  -- 'user:<username>' or 'ip:<address>'
+    window_start REAL NOT NULL,
+    previous_count INTEGER NOT NULL DEFAULT 0,
+    current_count INTEGER NOT NULL DEFAULT 0,
+    blocked_until REAL NOT NULL DEFAULT 0,
+    strikes INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+-- Progress of bulk imports (database/bulk.py), committed with each batch so an
+-- interrupted import resumes after the last committed record
+CREATE TABLE IF NOT EXISTS import_checkpoints (
+    source TEXT PRIMARY KEY,  -- '<kind>:<absolute path of the input file>'
+    fingerprint TEXT NOT NULL,  -- '<size>:<mtime_ns>' of the file when the import started
+    records INTEGER NOT NULL DEFAULT 0,  -- Input records consumed (imported or rejected)
+    completed INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP NOT NULL
+);
+
+-- Version counters behind the ETag/Last-Modified headers, bumped by the
+-- review write functions in the same transaction as the write
+CREATE TABLE IF NOT EXISTS data_versions (
+    scope TEXT PRIMARY KEY,  -- 'global', 'title:<title>', 'review:<id>' or 'database'
+    version INTEGER NOT NULL,
+    modified_at REAL NOT NULL  -- Unix time of the last bump
+) WITHOUT ROWID;
+
+-- Random per-database value included in every ETag, so a recreated database
+-- never produces an ETag a client saw before
+INSERT OR IGNORE INTO data_versions (scope, version, modified_at)
+VALUES ('database', abs(random()), (julianday('now') - 2440587.5) * 86400.0);
+
+-- Change log behind /api/sync. Every insert/update/delete of a review appends
+-- a row; seq is AUTOINCREMENT so sequence numbers are never reused.
+-- models/changes.py compacts it to the latest row per review and drops old
+-- tombstones, recording the highest dropped seq in review_changes_horizon.
+CREATE TABLE IF NOT EXISTS review_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    review_id INTEGER NOT NULL,
+    op TEXT NOT NULL CHECK(op IN ('upsert', 'delete')),
+    changed_at REAL NOT NULL  -- Unix time
+);
+
+-- Compaction looks up the newest row of each review
+CREATE INDEX IF NOT EXISTS idx_review_changes_review ON review_changes(review_id, seq);
+
+-- Clients whose cursor is below through_seq may have missed a dropped tombstone
+CREATE TABLE IF NOT EXISTS review_changes_horizon (
+    id INTEGER PRIMARY KEY CHECK(id = 1),
+    through_seq INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO review_changes_horizon (id, through_seq) VALUES (1, 0);
+
+CREATE TRIGGER IF NOT EXISTS trg_reviews_changes_insert
+AFTER INSERT ON reviews
+BEGIN
+    INSERT INTO review_changes (review_id, op, changed_at)
+    VALUES (NEW.id, 'upsert', (julianday('now') - 2440587.5) * 86400.0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_reviews_changes_update
+AFTER UPDATE ON reviews
+BEGIN
+    INSERT INTO review_changes (review_id, op, changed_at)
+    VALUES (NEW.id, 'upsert', (julianday('now') - 2440587.5) * 86400.0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_reviews_changes_delete
+AFTER DELETE ON reviews
+BEGIN
+    INSERT INTO review_changes (review_id, op, changed_at)
+    VALUES (OLD.id, 'delete', (julianday('now') - 2440587.5) * 86400.0);
+END;
+
+-- Backfill one entry per existing review the first time the log is created,
+-- so a client syncing from 0 receives every review
+INSERT INTO review_changes (review_id, op, changed_at)
+SELECT id, 'upsert', (julianday('now') - 2440587.5) * 86400.0
+FROM reviews
+WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'review_changes')
+ORDER BY id;
@@ -1,16 +1,33 @@
 """
 Database Seeding Script
-Populates the database with sample users and Persona series reviews
+Populates the database with sample users and Persona series reviews, or
+generates synthetic users and reviews in any quantity
+
+Usage:
+    python database/seed_data.py
+    python database/seed_data.py --generate --users 20000 --reviews 1000000 --titles 100000 \
+        [--ratings 5,8,17,35,35] [--seed 42]
+
+Generated data is the same for the same options. Titles and authors follow
+Zipf distributions (a few popular titles and prolific users, a long tail of
+the rest), and every generated user's password is GENERATED_PASSWORD.
 """
 
+import argparse
+import random
 import sqlite3
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import config
+from models.db import init_schema, get_db_connection, release_db_connection, close_all_connections
+from models.versions import GLOBAL_SCOPE, bump_versions, title_scope
+from bulk import IMPORT_CACHE_SIZE, suspend_review_indexes, restore_review_indexes
 
 # Import bcrypt for password hashing
 try:
@@ -49,12 +66,15 @@ def seed_database():
             ('anonymous',       'anon@example.com',   'AnonPass000!'),
         ]
 
-        for username, email, password in users:
-            password_hash = hash_password(password)
-            cursor.execute(
-                "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
-                (username, email, password_hash)
-            )
+        # Each hash takes ~250 ms, so compute them on every core at once
+        with ProcessPoolExecutor() as executor:
+            password_hashes = list(executor.map(hash_password, [password for _, _, password in users]))
+        cursor.executemany(
+            "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
+            [(username, email, password_hash)
+             for (username, email, _), password_hash in zip(users, password_hashes)]
+        )
+        for username, email, _ in users:
             print(f"[OK] Created user: {username} ({email})")
 
         conn.commit()
@@ -145,12 +165,13 @@ def seed_database():
              5, 'game', 1),
         ]
 
+        cursor.executemany(
+            "INSERT INTO reviews (user_id, title, review_text, rating, review_date, category) VALUES (?, ?, ?, ?, ?, ?)",
+            [(user_id, title, review_text, rating,
+              (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d %H:%M:%S'), category)
+             for user_id, title, review_text, rating, category, days_ago in reviews]
+        )
         for user_id, title, review_text, rating, category, days_ago in reviews:
-            review_date = (datetime.now() - timedelta(days=days_ago)).strftime('%Y-%m-%d %H:%M:%S')
-            cursor.execute(
-                "INSERT INTO reviews (user_id, title, review_text, rating, review_date, category) VALUES (?, ?, ?, ?, ?, ?)",
-                (user_id, title, review_text, rating, review_date, category)
-            )
             print(f"[OK] Created review: {title} - {rating}* by user {user_id}")
 
         conn.commit()
@@ -183,5 +204,217 @@ def seed_database():
     finally:
         conn.close()
 
+# === Generated data ===
+
+# Password of every generated user
+GENERATED_PASSWORD = 'SeedPass123!'
+
+# Zipf exponents: higher puts more reviews on the most popular titles/users
+TITLE_SKEW = 1.1
+USER_SKEW = 0.9
+
+# Default share of reviews with each rating from 1 to 5
+DEFAULT_RATING_WEIGHTS = (5, 8, 17, 35, 35)
+
+# Reviews are dated within this many days before DATASET_END
+DATE_SPAN_DAYS = 3 * 365
+DATASET_END = datetime(2026, 1, 1)  # Fixed, so the dates do not depend on today
+
+# Distinct review texts; each review uses one of them
+TEXT_VARIANTS = 512
+
+_ADJECTIVES = [
+    'Silent', 'Crimson', 'Hidden', 'Broken', 'Electric', 'Forgotten', 'Golden', 'Hollow',
+    'Iron', 'Last', 'Midnight', 'Neon', 'Lonely', 'Savage', 'Shattered', 'Frozen',
+    'Burning', 'Distant', 'Endless', 'Final', 'Velvet', 'Wild', 'Quiet', 'Restless',
+    'Scarlet', 'Secret', 'Stolen', 'Sunken', 'Twisted', 'Wandering', 'Bitter', 'Brave',
+]
+_NOUNS = [
+    'Harbor', 'Empire', 'Garden', 'Kingdom', 'Machine', 'Ocean', 'Protocol', 'River',
+    'Signal', 'Station', 'Tower', 'Valley', 'Winter', 'Frontier', 'Horizon', 'Legacy',
+    'Mirror', 'Orbit', 'Paradox', 'Requiem', 'Shadow', 'Storm', 'Summit', 'Throne',
+    'Voyage', 'Witness', 'Archive', 'Cathedral', 'Dynasty', 'Eclipse', 'Labyrinth', 'Odyssey',
+]
+_WORDS = (
+    'story pacing soundtrack characters combat visuals ending plot dialogue world level '
+    'design boss music acting script camera twist mood sequel director studio puzzle '
+    'quest villain hero atmosphere writing animation gameplay controls difficulty chapter '
+    'great slow brilliant messy beautiful tedious clever forgettable gripping uneven '
+    'memorable charming bold flat tense hilarious moving predictable ambitious polished '
+    'really quite never always somewhat surprisingly oddly genuinely mostly barely'
+).split()
+
+def title_name(index):
+    """Title for a title index ('Silent Harbor', 'Crimson Harbor', ..., 'Silent Harbor 2', ...)"""
+    name = f'{_ADJECTIVES[index % len(_ADJECTIVES)]} {_NOUNS[(index // len(_ADJECTIVES)) % len(_NOUNS)]}'
+    part = index // (len(_ADJECTIVES) * len(_NOUNS))
+    return f'{name} {part + 1}' if part else name
+
+def zipf_cum_weights(count, skew):
+    """Cumulative weights of ranks 1..count under a Zipf distribution (for random.choices)"""
+    total = 0.0
+    weights = []
+    for rank in range(1, count + 1):
+        total += rank ** -skew
+        weights.append(total)
+    return weights
+
+def generate_reviews(rng, count, user_ids, titles, rating_weights):
+    """
+    Generate review rows
+
+    Each column is drawn for all rows at once (random.choices with k=count),
+    which is several times faster than drawing row by row.
+
+    Args:
+        rng (random.Random): Seeded generator
+        count (int): Reviews to generate
+        user_ids (list): Authors, most prolific first
+        titles (int): Distinct titles
+        rating_weights (tuple): Relative weights of ratings 1-5
+
+    Returns:
+        list: (user_id, title, review_text, rating, category, review_date) tuples
+    """
+    texts = [' '.join(rng.choices(_WORDS, k=rng.randint(10, 90))).capitalize() + '.'
+             for _ in range(TEXT_VARIANTS)]
+    names = [title_name(index) for index in range(titles)]
+    categories = ['game' if index % 3 == 0 else 'movie' for index in range(titles)]
+    days = [(DATASET_END - timedelta(days=day)).strftime('%Y-%m-%d') for day in range(1, DATE_SPAN_DAYS + 1)]
+    times = [f'{second // 3600:02d}:{second // 60 % 60:02d}:{second % 60:02d}' for second in range(86400)]
+
+    title_indexes = rng.choices(range(titles), cum_weights=zipf_cum_weights(titles, TITLE_SKEW), k=count)
+    return list(zip(
+        rng.choices(user_ids, cum_weights=zipf_cum_weights(len(user_ids), USER_SKEW), k=count),
+        [names[index] for index in title_indexes],
+        rng.choices(texts, k=count),
+        rng.choices(range(1, 6), weights=rating_weights, k=count),
+        [categories[index] for index in title_indexes],
+        [f'{day} {clock}' for day, clock in zip(rng.choices(days, k=count), rng.choices(times, k=count))]
+    ))
+
+def _suspend_review_triggers(conn):
+    """
+    Drop the per-row title_stats and change log triggers for a bulk load
+
+    generate_data() rebuilds what they maintain with one statement each, and
+    restore_review_indexes() puts the triggers back from schema.sql.
+    """
+    with conn:
+        conn.execute("DROP TRIGGER IF EXISTS trg_reviews_stats_insert")
+        conn.execute("DROP TRIGGER IF EXISTS trg_reviews_changes_insert")
+
+def generate_data(users, reviews, titles, rating_weights=DEFAULT_RATING_WEIGHTS, seed=42):
+    """
+    Add generated users and reviews to the configured database
+
+    Everything is inserted with executemany in a single transaction while
+    the review indexes, the full-text index and the per-row triggers are
+    suspended; they are rebuilt once afterwards. Every user shares one
+    password hash computed up front. The database is created if it does not
+    exist yet.
+
+    Args:
+        users (int): Users to create
+        reviews (int): Reviews to create
+        titles (int): Distinct titles the reviews are spread over
+        rating_weights (tuple): Relative weights of ratings 1-5
+        seed (int): Random seed; the same options produce the same data
+    """
+    started = time.perf_counter()
+    # In WAL mode every page of the load would be written twice, to the log
+    # and again by the checkpoint; a rollback journal writes it once. The
+    # app's connections switch the file back to WAL when they open it.
+    journal_mode = config.SQLITE_JOURNAL_MODE
+    config.SQLITE_JOURNAL_MODE = 'DELETE'
+    release_db_connection()
+    close_all_connections()
+
+    init_schema()
+    conn = get_db_connection()
+    conn.execute(f"PRAGMA cache_size = {IMPORT_CACHE_SIZE}")
+
+    # Usernames carry the id, so generating into a database twice never collides
+    first_user = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM users").fetchone()[0]
+    last_review = conn.execute("SELECT COALESCE(MAX(id), 0) FROM reviews").fetchone()[0]
+    user_ids = list(range(first_user, first_user + users))
+    password_hash = hash_password(GENERATED_PASSWORD)
+
+    rng = random.Random(seed)
+    # Shuffle which users are prolific so they are not simply the first ids
+    authors = user_ids[:]
+    rng.shuffle(authors)
+    rows = generate_reviews(rng, reviews, authors, titles, rating_weights)
+    print(f"Generated {len(rows):,} reviews in {time.perf_counter() - started:.1f}s", flush=True)
+
+    suspend_review_indexes(conn)
+    _suspend_review_triggers(conn)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT INTO users (id, username, email, password_hash) VALUES (?, ?, ?, ?)",
+                ((user_id, f'seed_user_{user_id}', f'seed_user_{user_id}@example.com', password_hash)
+                 for user_id in user_ids)
+            )
+            conn.executemany(
+                """INSERT INTO reviews (user_id, title, review_text, rating, category, review_date)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                rows
+            )
+            # What the suspended triggers would have recorded: a change log entry
+            # per new review, and title_stats (emptied here, schema.sql's backfill
+            # recomputes it from every review when the triggers are restored)
+            conn.execute(
+                """INSERT INTO review_changes (review_id, op, changed_at)
+                   SELECT id, 'upsert', (julianday('now') - 2440587.5) * 86400.0
+                   FROM reviews WHERE id > ? ORDER BY id""",
+                (last_review,)
+            )
+            conn.execute("DELETE FROM title_stats")
+            bump_versions(conn, [GLOBAL_SCOPE, *{title_scope(row[1]) for row in rows}])
+        print(f"[OK] Inserted {users:,} users and {len(rows):,} reviews", flush=True)
+    finally:
+        conn.execute(f"PRAGMA cache_size = {int(config.SQLITE_CACHE_SIZE)}")
+        restore_review_indexes(conn)
+        release_db_connection()
+        close_all_connections()
+        config.SQLITE_JOURNAL_MODE = journal_mode
+
+    print(f"[OK] Seeded {config.DATABASE_PATH} in {time.perf_counter() - started:.1f}s")
+    print(f"All generated users have the password: {GENERATED_PASSWORD}")
+
+def _rating_weights(value):
+    """argparse type for --ratings: five non-negative weights for ratings 1-5"""
+    try:
+        weights = tuple(float(weight) for weight in value.split(','))
+    except ValueError:
+        raise argparse.ArgumentTypeError("ratings must be numbers")
+    if len(weights) != 5 or min(weights) < 0 or not sum(weights):
+        raise argparse.ArgumentTypeError("ratings needs five non-negative weights, e.g. 5,8,17,35,35")
+    return weights
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Seed the review database")
+    parser.add_argument('--generate', action='store_true',
+                        help="Generate synthetic users and reviews instead of the sample data")
+    parser.add_argument('--users', type=int, default=1000, help="Users to generate (default: 1000)")
+    parser.add_argument('--reviews', type=int, default=100000, help="Reviews to generate (default: 100000)")
+    parser.add_argument('--titles', type=int, default=5000, help="Distinct titles (default: 5000)")
+    parser.add_argument('--ratings', type=_rating_weights, default=DEFAULT_RATING_WEIGHTS,
+                        help="Relative weights of ratings 1-5 (default: 5,8,17,35,35)")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed (default: 42)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if not args.generate:
+        seed_database()
+        return 0
+    if args.users < 1 or args.reviews < 0 or args.titles < 1:
+        print("Error: --users and --titles must be at least 1, --reviews at least 0")
+        return 2
+    generate_data(args.users, args.reviews, args.titles, args.ratings, args.seed)
+    return 0
+
 if __name__ == "__main__":
-    seed_database()
+    sys.exit(main())
@@ -4,7 +4,8 @@ Provides login_required decorator for protecting routes
 """
 
 from functools import wraps
-from flask import session, redirect, url_for, flash
+from flask import session, redirect, url_for, flash, abort
+import config
 
 def login_required(f):
     """
@@ -23,3 +24,22 @@ def login_required(f):
             return redirect(url_for('auth.login'))
         return f(*args, **kwargs)
     return decorated_function
+
+def admin_required(f):
+    """
+    Decorator to restrict a route to the users listed in ADMIN_USERNAMES
+
+    Everyone else gets 404, so the route's existence is not revealed.
+
+    Usage:
+        @debug_bp.route('/profile')
+        @admin_required
+        def profile():
+            ...
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_id' not in session or session.get('username') not in config.ADMIN_USERNAMES:
+            abort(404)
+        return f(*args, **kwargs)
+    return decorated_function
@@ -0,0 +1,149 @@
+"""
+Response Compression Middleware
+Compresses HTML/JSON responses according to the client's Accept-Encoding
+"""
+
+import zlib
+from flask import request
+import config
+
+# Optional: brotli compresses text about 15-20% smaller than gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def negotiate_encoding(available):
+    """
+    Pick the content encoding to send
+
+    Args:
+        available (tuple): Encodings the server can produce, most preferred first
+
+    Returns:
+        str: 'br' or 'gzip', None to send the response uncompressed
+    """
+    best = None
+    best_quality = 0
+    for encoding in available:
+        quality = request.accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def available_encodings():
+    """Encodings this process can produce, most preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+class _GzipEncoder:
+    """Incremental gzip stream"""
+
+    name = 'gzip'
+
+    def __init__(self, level):
+        # wbits 16+ writes the gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        """Emit everything compressed so far (the stream stays open)"""
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+class _BrotliEncoder:
+    """Incremental brotli stream"""
+
+    name = 'br'
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(mode=brotli.MODE_TEXT, quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+def _encoder(encoding):
+    """Create an encoder at the configured level"""
+    if encoding == 'br':
+        return _BrotliEncoder(config.COMPRESSION_BROTLI_QUALITY)
+    return _GzipEncoder(config.COMPRESSION_LEVEL)
+
+def _compress_stream(chunks, encoder):
+    """
+    Compress a streamed body chunk by chunk
+
+    Each chunk is flushed, so the browser can start rendering the top of the
+    page while the rest is still being generated.
+
+    Args:
+        chunks (iterable): Body chunks (str or bytes)
+        encoder: _GzipEncoder or _BrotliEncoder
+    """
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if not chunk:
+                continue
+            data = encoder.compress(chunk) + encoder.flush()
+            if data:
+                yield data
+        yield encoder.finish()
+    finally:
+        # Let stream_with_context generators pop their request context
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+def compress_response(response):
+    """
+    after_request hook compressing text responses
+
+    Skips responses that are not a compressible type, are already encoded,
+    are served straight from a file (static files have precompressed
+    siblings instead) or are smaller than COMPRESSION_MIN_SIZE. Streamed
+    pages are compressed incrementally without buffering the whole body.
+    """
+    if not config.COMPRESSION_ENABLED:
+        return response
+
+    compressible = (
+        response.status_code == 200
+        and response.mimetype in config.COMPRESSION_MIMETYPES
+        and 'Content-Encoding' not in response.headers
+        and not response.direct_passthrough
+    )
+    if not compressible:
+        return response
+
+    # The body depends on Accept-Encoding whether or not this one is compressed
+    response.vary.add('Accept-Encoding')
+
+    encoding = negotiate_encoding(available_encodings())
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, _encoder(encoding))
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < config.COMPRESSION_MIN_SIZE:
+            return response
+        encoder = _encoder(encoding)
+        response.set_data(encoder.compress(body) + encoder.finish())
+
+    response.headers['Content-Encoding'] = encoding
+    # The compressed bytes differ from the identity ones, so a strong ETag
+    # would be wrong; conditional GETs compare weakly and still match
+    if response.headers.get('ETag', '').startswith('"'):
+        response.headers['ETag'] = 'W/' + response.headers['ETag']
+    return response
@@ -0,0 +1,190 @@
+"""
+Login Throttle Middleware
+Limits failed login attempts per username and per IP address so that
+password guessing cannot make the server run bcrypt without bound
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+import config
+from models.db import get_db_connection
+
+# Per-key state: [window_start, previous_count, current_count, blocked_until, strikes]
+# Failures are counted in fixed windows; the sliding count weights the
+# previous window by how much of it still overlaps the last WINDOW seconds.
+_START, _PREVIOUS, _CURRENT, _BLOCKED_UNTIL, _STRIKES = range(5)
+
+def _new_state(now):
+    return [now, 0, 0, 0.0, 0]
+
+def _roll(state, now, window):
+    """Advance a state's windows to the current time"""
+    elapsed = now - state[_START]
+    if elapsed >= 2 * window:
+        # Quiet for two whole windows: forget old failures and strikes
+        blocked_until = state[_BLOCKED_UNTIL]
+        strikes = state[_STRIKES] if blocked_until > now else 0
+        return [now, 0, 0, blocked_until, strikes]
+    if elapsed >= window:
+        state[_START] += window
+        state[_PREVIOUS] = state[_CURRENT]
+        state[_CURRENT] = 0
+    return state
+
+def _sliding_count(state, now, window):
+    """Estimated failures in the last `window` seconds"""
+    overlap = 1 - (now - state[_START]) / window
+    return state[_PREVIOUS] * max(overlap, 0) + state[_CURRENT]
+
+class MemoryThrottleStore:
+    """Per-process store: a bounded LRU of key -> state"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            state = self._states.get(key)
+            return list(state) if state else None
+
+    def update(self, key, func):
+        """Apply func(state or None) -> new state atomically"""
+        with self._lock:
+            state = func(self._states.get(key))
+            if state is None:
+                self._states.pop(key, None)
+                return
+            self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_entries:
+                self._states.popitem(last=False)
+
+class SqliteThrottleStore:
+    """Store shared by every worker through the login_throttle table"""
+
+    def get(self, key):
+        conn = get_db_connection()
+        row = conn.execute(
+            """SELECT window_start, previous_count, current_count, blocked_until, strikes
+               FROM login_throttle WHERE key = ?""",
+            (key,)
+        ).fetchone()
+        return list(row) if row else None
+
+    def update(self, key, func):
+        """Apply func(state or None) -> new state in one write transaction"""
+        conn = get_db_connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = func(self.get(key))
+            if state is None:
+                conn.execute("DELETE FROM login_throttle WHERE key = ?", (key,))
+            else:
+                conn.execute(
+                    """INSERT OR REPLACE INTO login_throttle
+                       (key, window_start, previous_count, current_count, blocked_until, strikes)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    (key, *state)
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def purge(self, older_than):
+        """Delete entries that are idle and no longer blocking"""
+        conn = get_db_connection()
+        with conn:
+            conn.execute(
+                "DELETE FROM login_throttle WHERE window_start < ? AND blocked_until < ?",
+                (older_than, time.time())
+            )
+
+class LoginThrottle:
+    """
+    Sliding-window failure limits with exponential lockout
+
+    Once a key (username or IP) reaches its failure limit inside the window
+    it is locked out for BASE_LOCKOUT seconds, doubling with every further
+    lockout up to MAX_LOCKOUT. A successful login clears the username's state.
+    """
+
+    def __init__(self, store, window, username_limit, ip_limit, base_lockout, max_lockout):
+        self.store = store
+        self.window = window
+        self.limits = {'user': username_limit, 'ip': ip_limit}
+        self.base_lockout = base_lockout
+        self.max_lockout = max_lockout
+        self._failures_since_purge = 0
+
+    def retry_after(self, username, ip):
+        """
+        Check whether a login attempt may proceed
+
+        Args:
+            username (str): Submitted username
+            ip (str): Client IP address
+
+        Returns:
+            int: Seconds until an attempt is allowed, 0 if allowed now
+        """
+        now = time.time()
+        wait = 0.0
+        for key in self._keys(username, ip):
+            state = self.store.get(key)
+            if state and state[_BLOCKED_UNTIL] > now:
+                wait = max(wait, state[_BLOCKED_UNTIL] - now)
+        return math.ceil(wait)
+
+    def record_failure(self, username, ip):
+        """Count a failed attempt against the username and the IP"""
+        now = time.time()
+        for key in self._keys(username, ip):
+            limit = self.limits[key.split(':', 1)[0]]
+
+            def apply(state, limit=limit):
+                state = _roll(list(state) if state else _new_state(now), now, self.window)
+                state[_CURRENT] += 1
+                if _sliding_count(state, now, self.window) >= limit and state[_BLOCKED_UNTIL] <= now:
+                    state[_STRIKES] += 1
+                    lockout = self.base_lockout * 2 ** (state[_STRIKES] - 1)
+                    state[_BLOCKED_UNTIL] = now + min(lockout, self.max_lockout)
+                return state
+
+            self.store.update(key, apply)
+
+        self._failures_since_purge += 1
+        if self._failures_since_purge >= 1000 and hasattr(self.store, 'purge'):
+            self._failures_since_purge = 0
+            self.store.purge(now - 2 * self.window)
+
+    def record_success(self, username):
+        """Clear a username's failures after a successful login"""
+        self.store.update(f'user:{username.lower()}', lambda state: None)
+
+    def _keys(self, username, ip):
+        keys = [f'user:{username.lower()}']
+        if ip:
+            keys.append(f'ip:{ip}')
+        return keys
+
+def _create_throttle():
+    """Build the throttle configured in config.py"""
+    if config.LOGIN_THROTTLE_BACKEND == 'sqlite':
+        store = SqliteThrottleStore()
+    else:
+        store = MemoryThrottleStore(config.LOGIN_THROTTLE_MAX_ENTRIES)
+    return LoginThrottle(
+        store,
+        window=config.LOGIN_THROTTLE_WINDOW,
+        username_limit=config.LOGIN_THROTTLE_USERNAME_LIMIT,
+        ip_limit=config.LOGIN_THROTTLE_IP_LIMIT,
+        base_lockout=config.LOGIN_THROTTLE_BASE_LOCKOUT,
+        max_lockout=config.LOGIN_THROTTLE_MAX_LOCKOUT
+    )
+
+login_throttle = _create_throttle()
@@ -0,0 +1,149 @@
+"""
+Review Change Log Model
+Reads and compacts the review_changes log used for incremental sync
+"""
+
+import logging
+import threading
+import time
+from models.db import get_db_connection, release_db_connection
+import config
+
+logger = logging.getLogger(__name__)
+
+def get_changes_since(since, limit=None):
+    """
+    Get the reviews changed after a sync cursor
+
+    Each changed review is reported once, from its current state: as an
+    upsert with its current data if it still exists, otherwise as a delete.
+
+    Args:
+        since (int): Cursor returned by the previous sync (0 for a full sync)
+        limit (int, optional): Log entries to read (capped at SYNC_MAX_PAGE_SIZE)
+
+    Returns:
+        dict: reset (bool, the client must discard its copy and sync from 0),
+              upserts (review dicts), deletes (review ids), cursor (int) and
+              has_more (bool); None if the log could not be read
+    """
+    limit = min(limit or config.SYNC_PAGE_SIZE, config.SYNC_MAX_PAGE_SIZE)
+    try:
+        conn = get_db_connection()
+        horizon = conn.execute(
+            "SELECT through_seq FROM review_changes_horizon WHERE id = 1"
+        ).fetchone()
+        latest = conn.execute(
+            "SELECT seq FROM sqlite_sequence WHERE name = 'review_changes'"
+        ).fetchone()
+        horizon = horizon[0] if horizon else 0
+        latest = latest[0] if latest else 0
+
+        # Tombstones the client may not have seen were dropped, or the cursor
+        # belongs to a different database
+        if since < horizon or since > latest:
+            return {'reset': True, 'upserts': [], 'deletes': [], 'cursor': 0, 'has_more': True}
+
+        rows = conn.execute(
+            """SELECT c.seq, c.review_id, reviews.*, users.username
+               FROM review_changes c
+               LEFT JOIN reviews ON reviews.id = c.review_id
+               LEFT JOIN users ON users.id = reviews.user_id
+               WHERE c.seq > ?
+               ORDER BY c.seq
+               LIMIT ?""",
+            (since, limit + 1)
+        ).fetchall()
+    except Exception:
+        logger.exception("Error reading review changes")
+        return None
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    # A review changed several times in this page is reported once
+    changed = {}
+    for row in rows:
+        changed[row['review_id']] = row
+    upserts = []
+    deletes = []
+    for review_id, row in changed.items():
+        if row['id'] is None:
+            deletes.append(review_id)
+        else:
+            review = dict(row)
+            del review['seq'], review['review_id']
+            upserts.append(review)
+
+    return {
+        'reset': False,
+        'upserts': upserts,
+        'deletes': deletes,
+        'cursor': rows[-1]['seq'] if rows else since,
+        'has_more': has_more
+    }
+
+def compact_review_changes(retention=None):
+    """
+    Shrink the change log
+
+    Keeps only the newest entry per review (older ones never change what a
+    client receives), then drops tombstones older than the retention period.
+    Clients with a cursor below the newest dropped tombstone are told to
+    resync from scratch.
+
+    Args:
+        retention (float, optional): Seconds to keep tombstones
+            (default SYNC_TOMBSTONE_RETENTION)
+
+    Returns:
+        int: Log entries removed, None on error
+    """
+    retention = config.SYNC_TOMBSTONE_RETENTION if retention is None else retention
+    cutoff = time.time() - retention
+    try:
+        conn = get_db_connection()
+        with conn:
+            superseded = conn.execute(
+                """DELETE FROM review_changes
+                   WHERE EXISTS (
+                       SELECT 1 FROM review_changes newer
+                       WHERE newer.review_id = review_changes.review_id
+                         AND newer.seq > review_changes.seq
+                   )"""
+            ).rowcount
+
+            dropped_through = conn.execute(
+                "SELECT MAX(seq) FROM review_changes WHERE op = 'delete' AND changed_at < ?",
+                (cutoff,)
+            ).fetchone()[0]
+            tombstones = 0
+            if dropped_through is not None:
+                tombstones = conn.execute(
+                    "DELETE FROM review_changes WHERE op = 'delete' AND seq <= ?",
+                    (dropped_through,)
+                ).rowcount
+                conn.execute(
+                    """UPDATE review_changes_horizon SET through_seq = MAX(through_seq, ?)
+                       WHERE id = 1""",
+                    (dropped_through,)
+                )
+        return superseded + tombstones
+    except Exception:
+        logger.exception("Error compacting review changes")
+        return None
+
+def start_compaction_thread(interval):
+    """
+    Compact the change log every `interval` seconds in a background thread
+
+    Args:
+        interval (float): Seconds between compactions
+    """
+    def run():
+        while True:
+            time.sleep(interval)
+            compact_review_changes()
+            release_db_connection()
+
+    threading.Thread(target=run, name='review-changes-compaction', daemon=True).start()
@@ -0,0 +1,200 @@
+"""
+Database Connection Manager
+Shares tuned SQLite connections between the model modules
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+import config
+
+# Schema shared with database/init_db.py (every statement is idempotent)
+SCHEMA_PATH = os.path.join(config.BASE_DIR, 'database', 'schema.sql')
+
+# Idle connections waiting to be reused by the next request
+_pool = queue.LifoQueue(maxsize=config.DB_POOL_SIZE)
+
+# The connection currently checked out by each worker thread
+_local = threading.local()
+
+# Callbacks notified of every statement (see add_statement_observer())
+_statement_observers = []
+
+def add_statement_observer(observer):
+    """
+    Register a callback timing the statements run on pooled connections
+
+    The observer is called as observer(sql, params, seconds, executed, rows):
+    once when a statement is executed (executed=True, rows = rows changed by
+    INSERT/UPDATE/DELETE) and again for each fetchone/fetchmany/fetchall on
+    its cursor (executed=False, rows = rows fetched), so a statement's total
+    time and row count are the sums over its calls.
+
+    Args:
+        observer (callable): Called on the thread that ran the statement
+    """
+    _statement_observers.append(observer)
+
+def _notify(sql, params, seconds, executed, rows):
+    """Pass a timed call to every observer"""
+    for observer in _statement_observers:
+        observer(sql, params, seconds, executed, rows)
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor reporting execute and fetch times to the statement observers"""
+
+    _sql = None
+    _params = None
+
+    def execute(self, sql, parameters=()):
+        if not _statement_observers:
+            return super().execute(sql, parameters)
+        self._sql, self._params = sql, parameters
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _notify(sql, parameters, time.perf_counter() - start, True, max(self.rowcount, 0))
+
+    def executemany(self, sql, seq_of_parameters):
+        if not _statement_observers:
+            return super().executemany(sql, seq_of_parameters)
+        self._sql, self._params = sql, None
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _notify(sql, None, time.perf_counter() - start, True, max(self.rowcount, 0))
+
+    def fetchone(self):
+        return self._timed_fetch(super().fetchone, lambda row: 0 if row is None else 1)
+
+    def fetchmany(self, size=None):
+        return self._timed_fetch(super().fetchmany, len, self.arraysize if size is None else size)
+
+    def fetchall(self):
+        return self._timed_fetch(super().fetchall, len)
+
+    def _timed_fetch(self, fetch, count, *args):
+        """Run a fetch method, timing it if anyone is observing"""
+        if not _statement_observers or self._sql is None:
+            return fetch(*args)
+        start = time.perf_counter()
+        result = None
+        try:
+            result = fetch(*args)
+            return result
+        finally:
+            rows = count(result) if result is not None else 0
+            _notify(self._sql, self._params, time.perf_counter() - start, False, rows)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose execute()/executemany() shortcuts use InstrumentedCursor"""
+
+    def execute(self, sql, parameters=()):
+        return self.cursor(InstrumentedCursor).execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor(InstrumentedCursor).executemany(sql, seq_of_parameters)
+
+def _connect():
+    """Open a new connection and apply the configured PRAGMAs"""
+    conn = sqlite3.connect(
+        config.DATABASE_PATH,
+        timeout=config.SQLITE_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,  # Connections move between threads via the pool
+        factory=InstrumentedConnection
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA journal_mode = {config.SQLITE_JOURNAL_MODE}")
+    conn.execute(f"PRAGMA synchronous = {config.SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = {int(config.SQLITE_CACHE_SIZE)}")
+    conn.execute(f"PRAGMA mmap_size = {int(config.SQLITE_MMAP_SIZE)}")
+    conn.execute("PRAGMA foreign_keys = ON")
+    return conn
+
+def get_db_connection():
+    """
+    Return the connection held by the current thread
+
+    The first call on a thread checks a connection out of the pool (or opens
+    a new one); later calls return the same connection until
+    release_db_connection() hands it back.
+
+    Returns:
+        sqlite3.Connection: Connection with row_factory set to sqlite3.Row
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        try:
+            conn = _pool.get_nowait()
+        except queue.Empty:
+            conn = _connect()
+        _local.conn = conn
+    return conn
+
+def release_db_connection(exception=None):
+    """
+    Return the current thread's connection to the pool
+
+    Registered as an app teardown handler so each request gives its
+    connection back when it finishes. Any transaction left open is rolled back.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        return
+    _local.conn = None
+
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        _pool.put_nowait(conn)
+    except (sqlite3.Error, queue.Full):
+        conn.close()
+
+def close_all_connections():
+    """Close every idle pooled connection (e.g. before replacing the database file)"""
+    while True:
+        try:
+            conn = _pool.get_nowait()
+        except queue.Empty:
+            break
+        conn.close()
+
+def init_schema():
+    """
+    Apply database/schema.sql to the configured database
+
+    Every statement in the schema is idempotent, so running this at startup
+    brings an existing database up to date with new tables, indexes and
+    triggers (and backfills derived tables) without touching existing data.
+    A newly created full-text index is populated from the existing reviews.
+    """
+    conn = _connect()
+    try:
+        had_search_index = _table_exists(conn, 'reviews_fts')
+        with open(SCHEMA_PATH, 'r') as schema_file:
+            conn.executescript(schema_file.read())
+        if not had_search_index:
+            rebuild_search_index(conn)
+    finally:
+        conn.close()
+
+def rebuild_search_index(conn):
+    """
+    Rebuild the reviews_fts full-text index from the reviews table
+
+    Args:
+        conn (sqlite3.Connection): Database connection
+    """
+    with conn:
+        conn.execute("INSERT INTO reviews_fts (reviews_fts) VALUES ('rebuild')")
+
+def _table_exists(conn, name):
+    """Check whether a table (or virtual table) exists"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (name,)
+    ).fetchone() is not None
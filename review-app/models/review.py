@@ -3,17 +3,122 @@ Review Model
 Handles review-related database operations
 """
 
-import sqlite3
-from datetime import datetime
+import logging
+import re
+from models.db import get_db_connection
+from utils.tracing import traced
+from models.versions import GLOBAL_SCOPE, bump_versions, mark_seen, review_scope, title_scope
+from utils.pagination import encode_cursor, decode_cursor
+from utils.cache import TaggedCache, cached, invalidate_tags, skip_caching
 import config
 
-def get_db_connection():
-    """Create and return a database connection"""
-    conn = sqlite3.connect(config.DATABASE_PATH)
-    conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON")
-    return conn
+logger = logging.getLogger(__name__)
 
+# Read results shared between requests; writes below drop the affected tags.
+# Cached values are shared, so callers must not mutate returned dicts/lists.
+review_cache = TaggedCache(
+    'reviews',
+    max_entries=config.RESULT_CACHE_MAX_ENTRIES,
+    ttl=config.RESULT_CACHE_TTL
+)
+
+# Markers wrapped around matched terms in search snippets. They cannot occur
+# in stored (sanitized) text, so the template can escape the snippet first
+# and then turn the markers into <mark> tags.
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+# Search ranking weights for the (title, review_text) columns
+SEARCH_WEIGHTS = (10.0, 1.0)
+
+def _review_cursor(review):
+    """Build the keyset cursor for a review row"""
+    return encode_cursor(review['review_date'], review['id'])
+
+def _empty_page():
+    """Page returned when a listing query fails"""
+    return {'reviews': [], 'next_cursor': None, 'prev_cursor': None}
+
+def _fetch_page(conn, query, params, after=None, before=None, limit=None):
+    """
+    Fetch one keyset page of reviews ordered newest first
+
+    Pages are keyed on (review_date, id), so each page is a bounded index
+    range scan no matter how deep into the listing it is.
+
+    Args:
+        conn (sqlite3.Connection): Database connection
+        query (str): SELECT over reviews ending in a WHERE clause
+        params (list): Parameters for the query
+        after (str, optional): Cursor of the last row of the previous page
+        before (str, optional): Cursor of the first row of the next page
+        limit (int, optional): Page size (defaults to REVIEWS_PER_PAGE)
+
+    Returns:
+        dict: reviews (list of dicts), next_cursor and prev_cursor (str or None)
+    """
+    limit = min(limit or config.REVIEWS_PER_PAGE, config.MAX_REVIEWS_PER_PAGE)
+    params = list(params)
+
+    before_key = decode_cursor(before, (str, int))
+    after_key = None if before_key else decode_cursor(after, (str, int))
+
+    if before_key:
+        # Walk backwards from the cursor, then flip the rows into display order
+        query += " AND (reviews.review_date, reviews.id) > (?, ?)"
+        query += " ORDER BY reviews.review_date ASC, reviews.id ASC LIMIT ?"
+        params.extend(before_key)
+    else:
+        if after_key:
+            query += " AND (reviews.review_date, reviews.id) < (?, ?)"
+            params.extend(after_key)
+        query += " ORDER BY reviews.review_date DESC, reviews.id DESC LIMIT ?"
+
+    # Fetch one extra row to find out whether another page exists
+    params.append(limit + 1)
+    rows = conn.execute(query, params).fetchall()
+    has_more = len(rows) > limit
+    reviews = [dict(row) for row in rows[:limit]]
+
+    next_cursor = prev_cursor = None
+    if before_key:
+        reviews.reverse()
+        if reviews:
+            next_cursor = _review_cursor(reviews[-1])
+            if has_more:
+                prev_cursor = _review_cursor(reviews[0])
+    elif reviews:
+        if has_more:
+            next_cursor = _review_cursor(reviews[-1])
+        if after_key:
+            prev_cursor = _review_cursor(reviews[0])
+
+    return {'reviews': reviews, 'next_cursor': next_cursor, 'prev_cursor': prev_cursor}
+
+def _get_review_owner_and_title(conn, review_id):
+    """Read the owner and title of a review before it is changed"""
+    return conn.execute(
+        "SELECT user_id, title FROM reviews WHERE id = ?",
+        (review_id,)
+    ).fetchone()
+
+def _bump_review_versions(conn, review_id, previous, new_title=None):
+    """Bump the data versions of a review that was updated or deleted (inside the write's transaction)"""
+    scopes = [GLOBAL_SCOPE, review_scope(review_id), title_scope(previous['title'])]
+    if new_title:
+        scopes.append(title_scope(new_title))
+    return bump_versions(conn, scopes)
+
+def _invalidate_review(review_id, previous, new_title=None):
+    """Drop cached results that include a review that was updated or deleted"""
+    tags = ['collection', ('review', review_id)]
+    if previous:
+        tags += [('title', previous['title']), ('user', previous['user_id'])]
+    if new_title:
+        tags.append(('title', new_title))
+    invalidate_tags(*tags)
+
+@traced()
 def create_review(user_id, title, review_text, rating, category):
     """
     Create a new review
@@ -30,31 +135,35 @@ def create_review(user_id, title, review_text, rating, category):
     """
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
-            """INSERT INTO reviews (user_id, title, review_text, rating, category)
-               VALUES (?, ?, ?, ?, ?)""",
-            (user_id, title, review_text, rating, category)
-        )
-        conn.commit()
-        review_id = cursor.lastrowid
-        conn.close()
+        with conn:  # Commits on success, rolls back on error
+            cursor = conn.execute(
+                """INSERT INTO reviews (user_id, title, review_text, rating, category)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (user_id, title, review_text, rating, category)
+            )
+            review_id = cursor.lastrowid
+            versions = bump_versions(conn, [GLOBAL_SCOPE, title_scope(title), review_scope(review_id)])
+        invalidate_tags('collection', ('title', title), ('user', user_id))
+        mark_seen(versions)
         return review_id
-    except Exception as e:
-        print(f"Error creating review: {e}")
+    except Exception:
+        logger.exception("Error creating review")
         return None
 
-def get_all_reviews(category=None, rating=None):
+@traced()
+def get_all_reviews(category=None, rating=None, after=None, before=None, limit=None):
     """
-    Get all reviews with optional filters
+    Get one page of reviews with optional filters
 
     Args:
         category (str, optional): Filter by 'movie' or 'game'
         rating (int, optional): Filter by rating
+        after (str, optional): Cursor to fetch the page after
+        before (str, optional): Cursor to fetch the page before
+        limit (int, optional): Page size
 
     Returns:
-        list: List of review dicts with user information
+        dict: Page with review dicts (including username) and next/prev cursors
     """
     try:
         conn = get_db_connection()
@@ -75,16 +184,90 @@ def get_all_reviews(category=None, rating=None):
             query += " AND reviews.rating = ?"
             params.append(rating)
 
-        query += " ORDER BY reviews.review_date DESC"
+        return _fetch_page(conn, query, params, after, before, limit)
+    except Exception:
+        logger.exception("Error retrieving reviews")
+        return _empty_page()
+
+def _search_expression(query):
+    """
+    Turn free text into a safe FTS5 query
 
-        reviews = conn.execute(query, params).fetchall()
-        conn.close()
+    Each word is quoted (so FTS5 operators and punctuation in user input
+    cannot cause syntax errors) and matched as a prefix; all words must match.
+    """
+    words = re.findall(r'\w+', query or '')[:config.SEARCH_MAX_TERMS]
+    return ' '.join(f'"{word}"*' for word in words)
 
-        return [dict(review) for review in reviews]
-    except Exception as e:
-        print(f"Error retrieving reviews: {e}")
-        return []
+@traced()
+def search_reviews(query, category=None, rating=None, cursor=None, limit=None):
+    """
+    Full-text search over review titles and text, best matches first
+
+    Args:
+        query (str): Words to search for
+        category (str, optional): Filter by 'movie' or 'game'
+        rating (int, optional): Filter by rating
+        cursor (str, optional): next_cursor from the previous page of results
+        limit (int, optional): Page size
 
+    Returns:
+        dict: reviews (dicts with username, score and a highlighted snippet)
+              and next_cursor (str or None)
+    """
+    expression = _search_expression(query)
+    if not expression:
+        return {'reviews': [], 'next_cursor': None}
+
+    try:
+        conn = get_db_connection()
+        limit = min(limit or config.REVIEWS_PER_PAGE, config.MAX_REVIEWS_PER_PAGE)
+        weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+
+        sql = f"""
+            SELECT reviews.*, users.username,
+                   bm25(reviews_fts, {weights}) AS score,
+                   snippet(reviews_fts, 1, ?, ?, '…', ?) AS snippet
+            FROM reviews_fts
+            JOIN reviews ON reviews.id = reviews_fts.rowid
+            JOIN users ON reviews.user_id = users.id
+            WHERE reviews_fts MATCH ?
+        """
+        params = [SNIPPET_START, SNIPPET_END, config.SEARCH_SNIPPET_TOKENS, expression]
+
+        if category:
+            sql += " AND reviews.category = ?"
+            params.append(category)
+
+        if rating:
+            sql += " AND reviews.rating = ?"
+            params.append(rating)
+
+        key = decode_cursor(cursor, (float, int))
+        if key:
+            sql += f" AND (bm25(reviews_fts, {weights}), reviews.id) > (?, ?)"
+            params.extend(key)
+
+        # bm25() is lower for better matches; id breaks ties so cursors are stable
+        sql += " ORDER BY score, reviews.id LIMIT ?"
+        params.append(limit + 1)
+
+        rows = conn.execute(sql, params).fetchall()
+        reviews = [dict(row) for row in rows[:limit]]
+
+        next_cursor = None
+        if len(rows) > limit:
+            last = reviews[-1]
+            next_cursor = encode_cursor(float(last['score']), last['id'])
+
+        return {'reviews': reviews, 'next_cursor': next_cursor}
+    except Exception:
+        logger.exception("Error searching reviews")
+        return {'reviews': [], 'next_cursor': None}
+
+@traced()
+@cached(review_cache, tags=lambda review_id: [('review', review_id)],
+        enabled=config.RESULT_CACHE_ENABLED)
 def get_review_by_id(review_id):
     """
     Get a single review by ID
@@ -104,40 +287,68 @@ def get_review_by_id(review_id):
                WHERE reviews.id = ?""",
             (review_id,)
         ).fetchone()
-        conn.close()
 
         if review:
             return dict(review)
         return None
-    except Exception as e:
-        print(f"Error retrieving review: {e}")
+    except Exception:
+        logger.exception("Error retrieving review")
+        skip_caching()
         return None
 
-def get_reviews_by_user_id(user_id):
+@traced()
+@cached(review_cache, tags=lambda user_id, **_: [('user', user_id)],
+        enabled=config.RESULT_CACHE_ENABLED)
+def get_reviews_by_user_id(user_id, after=None, before=None, limit=None):
     """
-    Get all reviews by a specific user
+    Get one page of reviews by a specific user
 
     Args:
         user_id (int): User ID
+        after (str, optional): Cursor to fetch the page after
+        before (str, optional): Cursor to fetch the page before
+        limit (int, optional): Page size
 
     Returns:
-        list: List of review dicts
+        dict: Page with review dicts and next/prev cursors
     """
     try:
         conn = get_db_connection()
-        reviews = conn.execute(
-            """SELECT * FROM reviews
-               WHERE user_id = ?
-               ORDER BY review_date DESC""",
-            (user_id,)
-        ).fetchall()
-        conn.close()
+        return _fetch_page(
+            conn,
+            "SELECT * FROM reviews WHERE user_id = ?",
+            [user_id], after, before, limit
+        )
+    except Exception:
+        logger.exception("Error retrieving user reviews")
+        skip_caching()
+        return _empty_page()
+
+@traced()
+@cached(review_cache, tags=lambda user_id: [('user', user_id)],
+        enabled=config.RESULT_CACHE_ENABLED)
+def count_reviews_by_user_id(user_id):
+    """
+    Count the reviews written by a user
 
-        return [dict(review) for review in reviews]
-    except Exception as e:
-        print(f"Error retrieving user reviews: {e}")
-        return []
+    Args:
+        user_id (int): User ID
+
+    Returns:
+        int: Number of reviews
+    """
+    try:
+        conn = get_db_connection()
+        return conn.execute(
+            "SELECT COUNT(*) FROM reviews WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()[0]
+    except Exception:
+        logger.exception("Error counting user reviews")
+        skip_caching()
+        return 0
 
+@traced()
 def update_review(review_id, title, review_text, rating, category):
     """
     Update an existing review
@@ -154,22 +365,26 @@ def update_review(review_id, title, review_text, rating, category):
     """
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
-            """UPDATE reviews
-               SET title = ?, review_text = ?, rating = ?, category = ?, updated_at = CURRENT_TIMESTAMP
-               WHERE id = ?""",
-            (title, review_text, rating, category, review_id)
-        )
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
+        with conn:
+            previous = _get_review_owner_and_title(conn, review_id)
+            cursor = conn.execute(
+                """UPDATE reviews
+                   SET title = ?, review_text = ?, rating = ?, category = ?, updated_at = CURRENT_TIMESTAMP
+                   WHERE id = ?""",
+                (title, review_text, rating, category, review_id)
+            )
+            success = cursor.rowcount > 0
+            if success:
+                versions = _bump_review_versions(conn, review_id, previous, title)
+        if success:
+            _invalidate_review(review_id, previous, title)
+            mark_seen(versions)
         return success
-    except Exception as e:
-        print(f"Error updating review: {e}")
+    except Exception:
+        logger.exception("Error updating review")
         return False
 
+@traced()
 def delete_review(review_id):
     """
     Delete a review
@@ -182,99 +397,134 @@ def delete_review(review_id):
     """
     try:
         conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute("DELETE FROM reviews WHERE id = ?", (review_id,))
-        conn.commit()
-        success = cursor.rowcount > 0
-        conn.close()
+        with conn:
+            previous = _get_review_owner_and_title(conn, review_id)
+            cursor = conn.execute("DELETE FROM reviews WHERE id = ?", (review_id,))
+            success = cursor.rowcount > 0
+            if success:
+                versions = _bump_review_versions(conn, review_id, previous)
+        if success:
+            _invalidate_review(review_id, previous)
+            mark_seen(versions)
         return success
-    except Exception as e:
-        print(f"Error deleting review: {e}")
+    except Exception:
+        logger.exception("Error deleting review")
         return False
 
+@traced()
+@cached(review_cache, tags=lambda: ['collection'],
+        enabled=config.RESULT_CACHE_ENABLED)
 def get_collection_items():
     """
     Get unique movie/game titles for the collection display.
     Returns one entry per unique title (the most recent review for that title),
-    ordered by a fixed series release order, with a count of reviews per title.
+    ordered by the series release order in title_order, with per-title stats.
+
+    Reads the title_stats table maintained by triggers, so the cost depends
+    on the number of titles rather than the number of reviews.
 
     Returns:
-        list: List of dicts with title, category, rating, id, username, review_text, review_count
+        list: List of dicts with title, category, rating, id, username, review_text,
+              review_count, average_rating
     """
-    # Desired display order — Persona series chronological release order
-    SERIES_ORDER = [
-        'Revelations: Persona',
-        'Persona 2: Innocent Sin',
-        'Persona 2: Eternal Punishment',
-        'Persona 3 FES',
-        'Persona 4 Golden',
-        'Persona Q: Shadow of the Labyrinth',
-        'Persona 5 Royal',
-        'Persona 3 ReLoad',
-    ]
-
     try:
         conn = get_db_connection()
         rows = conn.execute(
             """
             SELECT r.id, r.title, r.category, r.rating, r.review_text, r.review_date,
-                   u.username, counts.review_count
-            FROM reviews r
+                   r.updated_at, u.username, ts.review_count, ts.average_rating
+            FROM title_stats ts
+            JOIN reviews r ON r.id = ts.latest_review_id
             JOIN users u ON r.user_id = u.id
-            JOIN (
-                SELECT title, COUNT(*) AS review_count, MAX(review_date) AS latest
-                FROM reviews
-                GROUP BY title
-            ) counts ON r.title = counts.title AND r.review_date = counts.latest
-            GROUP BY r.title
+            ORDER BY ts.display_order, ts.title
             """
         ).fetchall()
-        conn.close()
 
-        rows = [dict(row) for row in rows]
+        return [dict(row) for row in rows]
+    except Exception:
+        logger.exception("Error retrieving collection items")
+        skip_caching()
+        return []
 
-        # Sort by the fixed series order; titles not in the list go to the end
-        def sort_key(row):
-            try:
-                return SERIES_ORDER.index(row['title'])
-            except ValueError:
-                return len(SERIES_ORDER)
 
-        rows.sort(key=sort_key)
-        return rows
-    except Exception as e:
-        print(f"Error retrieving collection items: {e}")
-        return []
+@traced()
+@cached(review_cache, tags=lambda title: [('title', title)],
+        enabled=config.RESULT_CACHE_ENABLED)
+def get_title_stats(title):
+    """
+    Get the aggregate statistics for a specific movie/game title.
 
+    Args:
+        title (str): The movie/game title
 
-def get_reviews_by_title(title):
+    Returns:
+        dict: review_count, average_rating, rating_1..rating_5 histogram and
+              latest_review_id, None if the title has no reviews
     """
-    Get all reviews for a specific movie/game title.
+    try:
+        conn = get_db_connection()
+        stats = conn.execute(
+            "SELECT * FROM title_stats WHERE title = ?",
+            (title,)
+        ).fetchone()
+
+        if stats:
+            return dict(stats)
+        return None
+    except Exception:
+        logger.exception("Error retrieving title stats")
+        skip_caching()
+        return None
+
+
+@traced()
+@cached(review_cache, tags=lambda title, **_: [('title', title)],
+        enabled=config.RESULT_CACHE_ENABLED)
+def get_reviews_by_title(title, after=None, before=None, limit=None):
+    """
+    Get one page of reviews for a specific movie/game title.
 
     Args:
         title (str): The movie/game title
+        after (str, optional): Cursor to fetch the page after
+        before (str, optional): Cursor to fetch the page before
+        limit (int, optional): Page size
 
     Returns:
-        list: List of review dicts with user information
+        dict: Page with review dicts (including username) and next/prev cursors
     """
     try:
         conn = get_db_connection()
-        reviews = conn.execute(
+        return _fetch_page(
+            conn,
             """SELECT reviews.*, users.username
                FROM reviews
                JOIN users ON reviews.user_id = users.id
-               WHERE reviews.title = ?
-               ORDER BY reviews.review_date DESC""",
-            (title,)
-        ).fetchall()
-        conn.close()
-        return [dict(r) for r in reviews]
-    except Exception as e:
-        print(f"Error retrieving reviews by title: {e}")
-        return []
+               WHERE reviews.title = ?""",
+            [title], after, before, limit
+        )
+    except Exception:
+        logger.exception("Error retrieving reviews by title")
+        skip_caching()
+        return _empty_page()
 
 
+@traced()
+def count_reviews_by_title(title):
+    """
+    Count the reviews for a specific movie/game title.
+
+    Args:
+        title (str): The movie/game title
+
+    Returns:
+        int: Number of reviews
+    """
+    stats = get_title_stats(title)
+    return stats['review_count'] if stats else 0
+
+
+@traced()
 def check_review_ownership(review_id, user_id):
     """
     Check if a user owns a specific review
@@ -290,3 +540,8 @@ def check_review_ownership(review_id, user_id):
     if not review:
         return False
     return review['user_id'] == user_id
+
+
+def warm_cache():
+    """Load the home page collection into the result cache at startup"""
+    get_collection_items()
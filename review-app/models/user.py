@@ -3,17 +3,15 @@ User Model
 Handles user-related database operations
 """
 
+import logging
 import sqlite3
-from utils.security import hash_password, verify_password
-import config
+from utils.security import hash_password, verify_password, needs_rehash, HashingUnavailable
+from models.db import get_db_connection
+from utils.tracing import traced
 
-def get_db_connection():
-    """Create and return a database connection"""
-    conn = sqlite3.connect(config.DATABASE_PATH)
-    conn.row_factory = sqlite3.Row  # Access columns by name
-    conn.execute("PRAGMA foreign_keys = ON")  # Enable foreign keys
-    return conn
+logger = logging.getLogger(__name__)
 
+@traced()
 def create_user(username, email, password):
     """
     Create a new user
@@ -29,23 +27,24 @@ def create_user(username, email, password):
     try:
         password_hash = hash_password(password)
         conn = get_db_connection()
-        cursor = conn.cursor()
-
-        cursor.execute(
-            "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
-            (username, email, password_hash)
-        )
-        conn.commit()
+        with conn:  # Commits on success, rolls back on error
+            cursor = conn.execute(
+                "INSERT INTO users (username, email, password_hash) VALUES (?, ?, ?)",
+                (username, email, password_hash)
+            )
         user_id = cursor.lastrowid
-        conn.close()
         return user_id
     except sqlite3.IntegrityError:
         # Username or email already exists
         return None
-    except Exception as e:
-        print(f"Error creating user: {e}")
+    except HashingUnavailable:
+        # Let the route answer 503 instead of reporting a failed registration
+        raise
+    except Exception:
+        logger.exception("Error creating user")
         return None
 
+@traced()
 def get_user_by_username(username):
     """
     Retrieve user by username
@@ -62,15 +61,15 @@ def get_user_by_username(username):
             "SELECT id, username, email, password_hash, created_at FROM users WHERE username = ?",
             (username,)
         ).fetchone()
-        conn.close()
 
         if user:
             return dict(user)
         return None
-    except Exception as e:
-        print(f"Error retrieving user: {e}")
+    except Exception:
+        logger.exception("Error retrieving user")
         return None
 
+@traced()
 def get_user_by_email(email):
     """
     Retrieve user by email
@@ -87,15 +86,15 @@ def get_user_by_email(email):
             "SELECT id, username, email, password_hash, created_at FROM users WHERE email = ?",
             (email,)
         ).fetchone()
-        conn.close()
 
         if user:
             return dict(user)
         return None
-    except Exception as e:
-        print(f"Error retrieving user: {e}")
+    except Exception:
+        logger.exception("Error retrieving user")
         return None
 
+@traced()
 def get_user_by_id(user_id):
     """
     Retrieve user by ID
@@ -112,15 +111,15 @@ def get_user_by_id(user_id):
             "SELECT id, username, email, created_at FROM users WHERE id = ?",
             (user_id,)
         ).fetchone()
-        conn.close()
 
         if user:
             return dict(user)
         return None
-    except Exception as e:
-        print(f"Error retrieving user: {e}")
+    except Exception:
+        logger.exception("Error retrieving user")
         return None
 
+@traced()
 def verify_user_password(username, password):
     """
     Verify user credentials
@@ -131,13 +130,47 @@ def verify_user_password(username, password):
 
     Returns:
         dict: User data if credentials valid, None otherwise
+
+    Raises:
+        HashingUnavailable: If the password hashing pool is saturated
     """
     user = get_user_by_username(username)
     if not user:
         return None
 
     if verify_password(password, user['password_hash']):
+        if needs_rehash(user['password_hash']):
+            update_password_hash(user['id'], password)
         # Remove password_hash from returned user data
         del user['password_hash']
         return user
     return None
+
+@traced()
+def update_password_hash(user_id, password):
+    """
+    Re-hash a password at the configured cost factor
+
+    Called after a successful login when the stored hash was created with a
+    different BCRYPT_LOG_ROUNDS. Failures are logged and ignored so the login
+    still succeeds.
+
+    Args:
+        user_id (int): User ID
+        password (str): Plain text password that was just verified
+
+    Returns:
+        bool: True if the hash was updated, False otherwise
+    """
+    try:
+        password_hash = hash_password(password)
+        conn = get_db_connection()
+        with conn:
+            conn.execute(
+                "UPDATE users SET password_hash = ? WHERE id = ?",
+                (password_hash, user_id)
+            )
+        return True
+    except Exception:
+        logger.exception("Error updating password hash")
+        return False
@@ -0,0 +1,121 @@
+"""
+Data Version Model
+Version counters for cached pages, bumped in the same transaction as each write
+"""
+
+import logging
+import threading
+import time
+from models.db import get_db_connection
+from utils.cache import invalidate_tags
+
+logger = logging.getLogger(__name__)
+
+# Scopes: GLOBAL_SCOPE changes with every review write, 'title:<title>' and
+# 'review:<id>' with writes to that title/review. DATABASE_SCOPE is set once
+# when the table is created so ETags never repeat across recreated databases.
+GLOBAL_SCOPE = 'global'
+DATABASE_SCOPE = 'database'
+
+# Latest version of each scope seen by this process
+_seen = {}
+_seen_lock = threading.Lock()
+
+def title_scope(title):
+    return f'title:{title}'
+
+def review_scope(review_id):
+    return f'review:{review_id}'
+
+def _scope_tag(scope):
+    """Result cache tag holding data covered by a scope"""
+    if scope == GLOBAL_SCOPE:
+        return 'collection'
+    kind, _, key = scope.partition(':')
+    if kind == 'title':
+        return ('title', key)
+    if kind == 'review':
+        return ('review', int(key))
+    return None
+
+def bump_versions(conn, scopes):
+    """
+    Increment the version of each scope
+
+    Call inside the write's transaction so a reader that sees the new
+    version also sees the new data.
+
+    Args:
+        conn (sqlite3.Connection): Connection with the write's open transaction
+        scopes (iterable): Scopes changed by the write
+
+    Returns:
+        dict: scope -> (version, modified_at) after the bump
+    """
+    now = time.time()
+    versions = {}
+    for scope in dict.fromkeys(scopes):
+        row = conn.execute(
+            """INSERT INTO data_versions (scope, version, modified_at) VALUES (?, 1, ?)
+               ON CONFLICT(scope) DO UPDATE SET
+                   version = version + 1,
+                   modified_at = excluded.modified_at
+               RETURNING version, modified_at""",
+            (scope, now)
+        ).fetchone()
+        versions[scope] = (row[0], row[1])
+    return versions
+
+def mark_seen(versions):
+    """
+    Record versions whose cached data this process has already invalidated
+
+    Args:
+        versions (dict): Result of bump_versions(), passed after the commit
+    """
+    with _seen_lock:
+        for scope, version in versions.items():
+            if _seen.get(scope, (0, None))[0] < version[0]:
+                _seen[scope] = version
+
+def get_data_versions(scopes):
+    """
+    Read the current version of each scope
+
+    When a scope moved since this process last looked (another worker wrote),
+    the matching result cache entries are dropped, so data loaded after this
+    call is at least as new as the versions returned.
+
+    Args:
+        scopes (list): Scopes to read
+
+    Returns:
+        dict: scope -> (version, modified_at), (0, None) if never written;
+              None if the versions could not be read
+    """
+    try:
+        conn = get_db_connection()
+        placeholders = ', '.join('?' * len(scopes))
+        rows = conn.execute(
+            f"SELECT scope, version, modified_at FROM data_versions WHERE scope IN ({placeholders})",
+            scopes
+        ).fetchall()
+    except Exception:
+        logger.exception("Error reading data versions")
+        return None
+
+    versions = {scope: (0, None) for scope in scopes}
+    versions.update({row['scope']: (row['version'], row['modified_at']) for row in rows})
+
+    stale_tags = []
+    with _seen_lock:
+        for scope, version in versions.items():
+            seen = _seen.get(scope)
+            if seen != version:
+                _seen[scope] = version
+                tag = _scope_tag(scope)
+                if tag is not None:
+                    stale_tags.append(tag)
+    if stale_tags:
+        invalidate_tags(*stale_tags)
+    return versions
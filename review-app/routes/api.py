@@ -0,0 +1,167 @@
+"""
+API Routes
+Versioned read-only JSON API for the PWA
+"""
+
+import json
+from flask import Blueprint, Response, request
+from models.review import (
+    get_all_reviews, get_review_by_id, get_collection_items, get_reviews_by_title
+)
+from models.versions import GLOBAL_SCOPE, review_scope, title_scope
+from middleware.conditional import conditional
+from utils.validators import validate_category, validate_rating
+
+# Optional: orjson encodes several times faster than the standard library
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+api_bp = Blueprint('api', __name__)
+
+# Fields a review can be projected to with ?fields=. Text is returned as
+# stored (HTML-escaped), so it can be inserted into the page as HTML.
+REVIEW_FIELDS = ('id', 'user_id', 'username', 'title', 'review_text', 'rating',
+                 'category', 'review_date', 'updated_at')
+
+# Lists leave out the full text unless it is asked for
+REVIEW_LIST_FIELDS = tuple(field for field in REVIEW_FIELDS if field != 'review_text')
+
+TITLE_FIELDS = ('title', 'category', 'review_count', 'average_rating',
+                'latest_review_id', 'latest_review_date')
+
+class ApiError(Exception):
+    """Request error returned to the client as {"error": message}"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+@api_bp.errorhandler(ApiError)
+def handle_api_error(error):
+    return json_response({'error': error.message}, error.status)
+
+def json_response(payload, status=200):
+    """
+    Encode a payload as compact JSON
+
+    Args:
+        payload: JSON-serialisable data
+        status (int): HTTP status code
+
+    Returns:
+        Response: application/json response
+    """
+    if orjson is not None:
+        body = orjson.dumps(payload)
+    else:
+        body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False)
+    return Response(body, status=status, mimetype='application/json')
+
+def selected_fields(allowed, default):
+    """
+    Parse ?fields=a,b,c
+
+    Args:
+        allowed (tuple): Fields that may be requested
+        default (tuple): Fields returned when the parameter is absent
+
+    Returns:
+        tuple: Fields to return, in the requested order
+    """
+    raw = request.args.get('fields')
+    if not raw:
+        return default
+    fields = tuple(dict.fromkeys(field.strip() for field in raw.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown or not fields:
+        raise ApiError(f"Unknown fields: {', '.join(unknown) or raw}. Allowed: {', '.join(allowed)}")
+    return fields
+
+def project(row, fields):
+    """Copy the selected fields of a row"""
+    return {field: row[field] for field in fields}
+
+def page_limit():
+    """Parse ?limit= (the models cap it at MAX_REVIEWS_PER_PAGE)"""
+    limit = request.args.get('limit')
+    if limit is None:
+        return None
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ApiError("limit must be a number")
+    if limit < 1:
+        raise ApiError("limit must be at least 1")
+    return limit
+
+def page_response(page, fields):
+    """Wrap a keyset page of reviews"""
+    return json_response({
+        'data': [project(review, fields) for review in page['reviews']],
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor']
+    })
+
+@api_bp.route('/reviews')
+@conditional(lambda: [GLOBAL_SCOPE])
+def reviews():
+    """Reviews newest first, optionally filtered by ?category= and ?rating="""
+    category = request.args.get('category') or None
+    rating = request.args.get('rating') or None
+    if category and not validate_category(category)[0]:
+        raise ApiError("category must be 'movie' or 'game'")
+    if rating and not validate_rating(rating)[0]:
+        raise ApiError("rating must be between 1 and 5")
+
+    fields = selected_fields(REVIEW_FIELDS, REVIEW_LIST_FIELDS)
+    page = get_all_reviews(
+        category=category,
+        rating=int(rating) if rating else None,
+        after=request.args.get('after'),
+        before=request.args.get('before'),
+        limit=page_limit()
+    )
+    return page_response(page, fields)
+
+@api_bp.route('/reviews/<int:review_id>')
+@conditional(lambda review_id: [review_scope(review_id)])
+def review(review_id):
+    """A single review, with its full text by default"""
+    fields = selected_fields(REVIEW_FIELDS, REVIEW_FIELDS)
+    found = get_review_by_id(review_id)
+    if not found:
+        raise ApiError("Review not found", 404)
+    return json_response({'data': project(found, fields)})
+
+@api_bp.route('/titles')
+@conditional(lambda: [GLOBAL_SCOPE])
+def titles():
+    """Every reviewed title in collection order, with review stats"""
+    fields = selected_fields(TITLE_FIELDS, TITLE_FIELDS)
+    items = [
+        {
+            'title': item['title'],
+            'category': item['category'],
+            'review_count': item['review_count'],
+            'average_rating': item['average_rating'],
+            'latest_review_id': item['id'],
+            'latest_review_date': item['review_date']
+        }
+        for item in get_collection_items()
+    ]
+    return json_response({'data': [project(item, fields) for item in items]})
+
+@api_bp.route('/titles/<path:title>/reviews')
+@conditional(lambda title: [title_scope(title)])
+def title_reviews(title):
+    """Reviews of one title, newest first"""
+    fields = selected_fields(REVIEW_FIELDS, REVIEW_LIST_FIELDS)
+    after = request.args.get('after')
+    before = request.args.get('before')
+    page = get_reviews_by_title(title, after=after, before=before, limit=page_limit())
+    if not page['reviews'] and not (after or before):
+        raise ApiError("Title not found", 404)
+    return page_response(page, fields)
@@ -3,11 +3,17 @@ Authentication Routes
 Handles user registration, login, and logout
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
+import logging
+import sqlite3
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, abort
 from models.user import create_user, get_user_by_username, get_user_by_email, verify_user_password
 from utils.validators import validate_username, validate_email, validate_password
-from utils.security import sanitize_input
+from utils.security import sanitize_input, HashingUnavailable
 from middleware.csrf import get_csrf_token, validate_csrf_token
+from middleware.login_throttle import login_throttle
+import config
+
+logger = logging.getLogger(__name__)
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -62,8 +68,11 @@ def register():
             flash('An account with this email already exists.', 'danger')
             return render_template('auth/register.html', csrf_token=get_csrf_token())
 
-        # Create user
-        user_id = create_user(username, email, password)
+        # Create user (503 if the password hashing pool is saturated)
+        try:
+            user_id = create_user(username, email, password)
+        except HashingUnavailable:
+            abort(503)
         if user_id:
             flash('Registration successful! Please log in.', 'success')
             return redirect(url_for('auth.login'))
@@ -93,8 +102,35 @@ def login():
             flash('Please provide both username and password.', 'danger')
             return render_template('auth/login.html', csrf_token=get_csrf_token())
 
-        # Verify credentials
-        user = verify_user_password(username, password)
+        # Reject throttled usernames/IPs before spending a bcrypt verification
+        # A throttle store error (e.g. the sqlite backend's table is locked)
+        # must not turn the login into a 500: log it and skip throttling
+        throttled = config.LOGIN_THROTTLE_ENABLED
+        client_ip = request.remote_addr if config.LOGIN_THROTTLE_BY_IP else None
+        if throttled:
+            try:
+                retry_after = login_throttle.retry_after(username, client_ip)
+            except sqlite3.Error:
+                logger.exception("Login throttle unavailable; continuing without it")
+                throttled, retry_after = False, 0
+            if retry_after:
+                flash(f'Too many failed login attempts. Please try again in {retry_after} seconds.', 'danger')
+                return (render_template('auth/login.html', csrf_token=get_csrf_token()),
+                        429, {'Retry-After': str(retry_after)})
+
+        # Verify credentials (503 if the password hashing pool is saturated)
+        try:
+            user = verify_user_password(username, password)
+        except HashingUnavailable:
+            abort(503)
+        if throttled:
+            try:
+                if user:
+                    login_throttle.record_success(username)
+                else:
+                    login_throttle.record_failure(username, client_ip)
+            except sqlite3.Error:
+                logger.exception("Could not record the login attempt in the throttle")
         if user:
             # Create session
             session.clear()
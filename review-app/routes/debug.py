@@ -0,0 +1,82 @@
+"""
+Debug Routes
+On-demand CPU profiles and memory snapshots of a running worker (admins only)
+"""
+
+from flask import Blueprint, Response, request
+from middleware.auth_required import admin_required
+from utils.profiling import (
+    ProfilerBusy, format_collapsed, memory_snapshot, sample_stacks
+)
+import config
+
+debug_bp = Blueprint('debug', __name__)
+
+def _text(body, status=200):
+    """Plain-text response that is never cached"""
+    response = Response(body, status=status, mimetype='text/plain')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def _seconds_arg():
+    """Parse ?seconds=N (default 10); returns (seconds, error response or None)"""
+    try:
+        seconds = float(request.args.get('seconds', 10))
+    except ValueError:
+        return None, _text("seconds must be a number\n", 400)
+    if not 0 < seconds <= config.DEBUG_PROFILE_MAX_SECONDS:
+        return None, _text(f"seconds must be between 0 and {config.DEBUG_PROFILE_MAX_SECONDS}\n", 400)
+    return seconds, None
+
+@debug_bp.route('/profile')
+@admin_required
+def profile():
+    """
+    Sample every thread's stack for ?seconds=N (default 10)
+
+    Returns collapsed stacks for flamegraph.pl / speedscope, e.g.:
+        curl -b session.txt 'http://host/debug/profile?seconds=30' > app.folded
+        flamegraph.pl app.folded > app.svg
+
+    ?idle=0 leaves out threads blocked waiting for work.
+    """
+    seconds, error = _seconds_arg()
+    if error:
+        return error
+
+    try:
+        stacks = sample_stacks(
+            seconds,
+            config.DEBUG_PROFILE_INTERVAL,
+            include_idle=request.args.get('idle', '1') != '0'
+        )
+    except ProfilerBusy as e:
+        return _text(f"{e}\n", 409)
+    return _text(format_collapsed(stacks))
+
+@debug_bp.route('/memory')
+@admin_required
+def memory():
+    """
+    Trace allocations for ?seconds=N (default 10) and diff the heap
+
+    tracemalloc is stopped again before the response is sent. ?group=
+    lineno|filename|traceback picks the grouping and ?limit=N the number of sites.
+    """
+    seconds, error = _seconds_arg()
+    if error:
+        return error
+
+    key_type = request.args.get('group', 'lineno')
+    if key_type not in ('lineno', 'filename', 'traceback'):
+        return _text("group must be lineno, filename or traceback\n", 400)
+    try:
+        limit = max(1, min(int(request.args.get('limit', 25)), 500))
+    except ValueError:
+        return _text("limit must be a number\n", 400)
+
+    try:
+        report = memory_snapshot(seconds, config.DEBUG_TRACEMALLOC_FRAMES, key_type, limit)
+    except ProfilerBusy as e:
+        return _text(f"{e}\n", 409)
+    return _text(report)
@@ -4,12 +4,17 @@ Handles home page and other main application pages
 """
 
 import random
-from flask import Blueprint, render_template, request
+from flask import Blueprint, current_app, render_template, request, url_for
+import config
 from models.review import get_all_reviews, get_collection_items
+from utils.streaming import stream_page
+from middleware.conditional import conditional
+from models.versions import GLOBAL_SCOPE
 
 main_bp = Blueprint('main', __name__)
 
 @main_bp.route('/')
+@conditional(lambda: [GLOBAL_SCOPE], weak=True)  # Weak: the featured review is random
 def index():
     """Home page - displays collection and a featured review"""
     collection = get_collection_items()
@@ -17,7 +22,7 @@ def index():
     # Pick a random collection entry as the featured review each page load
     featured = random.choice(collection) if collection else None
 
-    return render_template(
+    return stream_page(
         'index.html',
         collection=collection,
         featured=featured
@@ -27,3 +32,30 @@ def index():
 def about():
     """About page"""
     return render_template('about.html')
+
+@main_bp.route('/service-worker.js')
+def service_worker():
+    """
+    Service worker script, served from the root so its scope is the whole app
+
+    Its cache name and precache list come from the asset manifest, so a
+    deploy that changes any static file installs a fresh cache. Only
+    fingerprinted static files are cached; pages and the API always go to
+    the network, so the root scope never serves stale or another user's pages.
+    """
+    manifest = current_app.extensions['asset_manifest']
+    precache_urls = [
+        url_for('static', filename=filename)
+        for filename in manifest.matching(config.SERVICE_WORKER_PRECACHE)
+    ]
+    body = render_template(
+        'service-worker.js',
+        cache_version=manifest.digest,
+        precache_urls=precache_urls,
+        static_prefix=current_app.static_url_path + '/'
+    )
+    # Browsers revalidate the worker script on every navigation check
+    return body, 200, {
+        'Content-Type': 'application/javascript; charset=utf-8',
+        'Cache-Control': 'no-cache'
+    }
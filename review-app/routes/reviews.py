@@ -7,12 +7,16 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash,
 from models.review import (
     create_review, get_all_reviews, get_review_by_id,
     get_reviews_by_user_id, update_review, delete_review,
-    check_review_ownership, get_reviews_by_title
+    get_reviews_by_title,
+    count_reviews_by_title, count_reviews_by_user_id, search_reviews
 )
 from utils.validators import validate_title, validate_review_text, validate_rating, validate_category
 from utils.security import sanitize_input
+from utils.streaming import stream_page
 from middleware.auth_required import login_required
 from middleware.csrf import get_csrf_token, validate_csrf_token
+from middleware.conditional import conditional
+from models.versions import review_scope, title_scope
 
 reviews_bp = Blueprint('reviews', __name__)
 
@@ -77,7 +81,36 @@ def create():
     # GET request - show create form
     return render_template('reviews/create.html', csrf_token=get_csrf_token())
 
+@reviews_bp.route('/search')
+def search():
+    """Full-text search over review titles and text"""
+    query = request.args.get('q', '').strip()
+    category = request.args.get('category', '')
+    rating = request.args.get('rating', '')
+
+    # Ignore invalid filters rather than failing the search
+    if category and not validate_category(category)[0]:
+        category = ''
+    if rating and not validate_rating(rating)[0]:
+        rating = ''
+
+    results = search_reviews(
+        query,
+        category=category or None,
+        rating=int(rating) if rating else None,
+        cursor=request.args.get('after')
+    )
+
+    return render_template(
+        'reviews/search.html',
+        query=query,
+        category=category,
+        rating=rating,
+        results=results
+    )
+
 @reviews_bp.route('/<int:review_id>')
+@conditional(lambda review_id: [review_scope(review_id)])
 def view(review_id):
     """View a single review"""
     review = get_review_by_id(review_id)
@@ -89,7 +122,13 @@ def view(review_id):
     if 'user_id' in session:
         is_owner = review['user_id'] == session['user_id']
 
-    return render_template('reviews/view.html', review=review, is_owner=is_owner)
+    # Only the owner's page has a form, so only it needs (and creates) a CSRF token
+    return render_template(
+        'reviews/view.html',
+        review=review,
+        is_owner=is_owner,
+        csrf_token=get_csrf_token() if is_owner else None
+    )
 
 @reviews_bp.route('/<int:review_id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -99,8 +138,8 @@ def edit(review_id):
     if not review:
         abort(404)
 
-    # Check ownership
-    if not check_review_ownership(review_id, session['user_id']):
+    # Check ownership on the review already loaded (no second lookup)
+    if review['user_id'] != session['user_id']:
         abort(403)
 
     if request.method == 'POST':
@@ -175,8 +214,8 @@ def delete(review_id):
     if not review:
         abort(404)
 
-    # Check ownership
-    if not check_review_ownership(review_id, session['user_id']):
+    # Check ownership on the review already loaded (no second lookup)
+    if review['user_id'] != session['user_id']:
         abort(403)
 
     # Delete review
@@ -189,18 +228,40 @@ def delete(review_id):
     return redirect(url_for('reviews.my_reviews'))
 
 @reviews_bp.route('/title/<path:title>')
+@conditional(lambda title: [title_scope(title)])
 def by_title(title):
     """View all reviews for a specific movie/game title"""
-    reviews = get_reviews_by_title(title)
-    if not reviews:
+    page = get_reviews_by_title(
+        title,
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
+    if not page['reviews']:
         abort(404)
-    category = reviews[0]['category']
-    return render_template('reviews/by_title.html', title=title, reviews=reviews, category=category)
+    category = page['reviews'][0]['category']
+    return stream_page(
+        'reviews/by_title.html',
+        title=title,
+        reviews=page['reviews'],
+        page=page,
+        review_count=count_reviews_by_title(title),
+        category=category
+    )
 
 
 @reviews_bp.route('/my')
 @login_required
 def my_reviews():
     """View current user's reviews"""
-    reviews = get_reviews_by_user_id(session['user_id'])
-    return render_template('reviews/my_reviews.html', reviews=reviews, csrf_token=get_csrf_token())
+    page = get_reviews_by_user_id(
+        session['user_id'],
+        after=request.args.get('after'),
+        before=request.args.get('before')
+    )
+    return stream_page(
+        'reviews/my_reviews.html',
+        reviews=page['reviews'],
+        page=page,
+        review_count=count_reviews_by_user_id(session['user_id']),
+        csrf_token=get_csrf_token()
+    )
@@ -0,0 +1,43 @@
+"""
+Sync Routes
+Incremental sync of reviews for offline clients
+"""
+
+from flask import Blueprint, request
+from models.changes import get_changes_since
+from routes.api import ApiError, REVIEW_FIELDS, handle_api_error, json_response, page_limit, project
+
+sync_bp = Blueprint('sync', __name__)
+sync_bp.register_error_handler(ApiError, handle_api_error)
+
+@sync_bp.route('/sync')
+def sync():
+    """
+    Reviews changed since ?since=<cursor>
+
+    Start with since=0 (every review), then pass back the returned cursor
+    until has_more is false. If reset is true the client's copy is too old
+    (or from another database): discard it and sync again from 0.
+    """
+    since = request.args.get('since', '0')
+    try:
+        since = int(since)
+    except ValueError:
+        raise ApiError("since must be a sync cursor (integer)")
+    if since < 0:
+        raise ApiError("since must not be negative")
+
+    changes = get_changes_since(since, limit=page_limit())
+    if changes is None:
+        raise ApiError("Sync is temporarily unavailable", 503)
+
+    response = json_response({
+        'reset': changes['reset'],
+        'upserts': [project(review, REVIEW_FIELDS) for review in changes['upserts']],
+        'deletes': changes['deletes'],
+        'cursor': changes['cursor'],
+        'has_more': changes['has_more']
+    })
+    # The answer for a cursor grows as reviews change, so never reuse it unchecked
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -1,16 +1,9 @@
 // Service Worker for PWA Offline Functionality
 
-const CACHE_NAME = 'review-app-v1';
-const urlsToCache = [
-    '/',
-    '/static/css/main.css',
-    '/static/css/auth.css',
-    '/static/css/reviews.css',
-    '/static/js/app.js',
-    '/static/js/auth.js',
-    '/static/js/reviews.js',
-    '/static/manifest.json'
-];
+// Generated from the asset manifest: the cache name changes whenever any
+// static file does, and assets are stored under their versioned URLs
+const CACHE_NAME = 'review-app-{{ cache_version }}';
+const urlsToCache = {{ precache_urls | tojson }};
 
 // Install Event - Cache Resources
 self.addEventListener('install', (event) => {
@@ -51,10 +44,19 @@ self.addEventListener('activate', (event) => {
     );
 });
 
-// Fetch Event - Serve from Cache, Fallback to Network
+// Fetch Event - Fingerprinted static files from the cache, everything else
+// from the network. Pages and /api/ responses are never stored: they change
+// (ETags and /api/sync keep them fresh) and some are private to the user.
+const STATIC_PREFIX = {{ static_prefix | tojson }};
+
 self.addEventListener('fetch', (event) => {
-    // Skip non-GET requests
-    if (event.request.method !== 'GET') {
+    const url = new URL(event.request.url);
+
+    // Only GETs of versioned (?v=) static URLs are immutable and safe to cache
+    if (event.request.method !== 'GET'
+        || url.origin !== self.location.origin
+        || !url.pathname.startsWith(STATIC_PREFIX)
+        || !url.searchParams.has('v')) {
         return;
     }
 
@@ -66,19 +68,14 @@ self.addEventListener('fetch', (event) => {
                     return response;
                 }
 
-                // Clone the request
-                const fetchRequest = event.request.clone();
-
-                return fetch(fetchRequest).then((response) => {
+                return fetch(event.request.clone()).then((response) => {
                     // Check if valid response
                     if (!response || response.status !== 200 || response.type !== 'basic') {
                         return response;
                     }
 
-                    // Clone the response
-                    const responseToCache = response.clone();
-
                     // Cache the fetched response
+                    const responseToCache = response.clone();
                     caches.open(CACHE_NAME)
                         .then((cache) => {
                             cache.put(event.request, responseToCache);
@@ -87,9 +84,5 @@ self.addEventListener('fetch', (event) => {
                     return response;
                 });
             })
-            .catch(() => {
-                // Offline fallback
-                console.log('Service Worker: Fetch failed, serving offline page');
-            })
     );
 });
@@ -0,0 +1,283 @@
+"""
+Static Asset Utilities
+Content-hashed URLs for static files so browsers can cache them for a year
+"""
+
+import fnmatch
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import click
+from flask import current_app, request, send_from_directory
+from flask.cli import AppGroup
+from werkzeug.security import safe_join
+import config
+from middleware.compression import brotli, negotiate_encoding
+
+logger = logging.getLogger(__name__)
+
+# Precompressed sibling extension per content encoding, most preferred first
+PRECOMPRESSED_EXTENSIONS = {'br': 'br', 'gzip': 'gz'}
+
+# Query parameter carrying a file's content hash, e.g. /static/css/main.css?v=3f2a9c1b7e04
+VERSION_ARG = 'v'
+
+class AssetManifest:
+    """
+    Map of static file -> short hash of its content
+
+    Loaded from the manifest written by `flask assets build` when it exists,
+    otherwise built by hashing the static folder once at startup. A file's
+    URL only changes when its content does, so versioned URLs can be served
+    as immutable.
+    """
+
+    def __init__(self, static_folder, manifest_path=None):
+        """
+        Args:
+            static_folder (str): Absolute path of the static folder
+            manifest_path (str, optional): Path of a prebuilt manifest file
+        """
+        self.static_folder = static_folder
+        self.manifest_path = manifest_path
+        self._versions = {}
+        self.digest = ''
+
+    def load(self):
+        """Read the prebuilt manifest, falling back to hashing the static folder"""
+        versions = None
+        if self.manifest_path and os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, encoding='utf-8') as f:
+                    versions = json.load(f)['files']
+            except (OSError, ValueError, KeyError):
+                logger.exception("Error reading asset manifest")
+        self._set(versions if versions is not None else self.scan())
+
+    def scan(self):
+        """
+        Hash every file in the static folder
+
+        Returns:
+            dict: Path relative to the static folder (with '/' separators) -> hash
+        """
+        versions = {}
+        for root, dirs, files in os.walk(self.static_folder):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                filename = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                if any(fnmatch.fnmatch(filename, pattern) for pattern in config.ASSET_EXCLUDE):
+                    continue
+                with open(path, 'rb') as f:
+                    versions[filename] = hashlib.sha256(f.read()).hexdigest()[:config.ASSET_HASH_LENGTH]
+        return versions
+
+    def write(self):
+        """
+        Hash the static folder and save the result as the manifest file
+
+        Returns:
+            int: Number of files in the manifest
+        """
+        self._set(self.scan())
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump({'digest': self.digest, 'files': self._versions}, f, indent=2, sort_keys=True)
+            f.write('\n')
+        return len(self._versions)
+
+    def version(self, filename):
+        """
+        Get the content hash of a static file
+
+        Args:
+            filename (str): Path relative to the static folder
+
+        Returns:
+            str: Hash, None if the file is not in the manifest
+        """
+        return self._versions.get(filename)
+
+    def matching(self, patterns):
+        """
+        List the files matching any of the glob patterns
+
+        Args:
+            patterns (tuple): Globs relative to the static folder, e.g. 'css/*'
+
+        Returns:
+            list: Matching paths relative to the static folder, sorted
+        """
+        return sorted(
+            filename for filename in self._versions
+            if any(fnmatch.fnmatch(filename, pattern) for pattern in patterns)
+        )
+
+    def _set(self, versions):
+        """Replace the file hashes and recompute the digest of the whole set"""
+        self._versions = versions
+        combined = '\n'.join(f'{filename}={version}' for filename, version in sorted(versions.items()))
+        self.digest = hashlib.sha256(combined.encode()).hexdigest()[:config.ASSET_HASH_LENGTH]
+
+def add_asset_version(endpoint, values):
+    """
+    url_defaults hook adding ?v=<hash> to url_for('static', filename=...)
+
+    Files missing from the manifest (e.g. posters added after startup) keep
+    their plain URL.
+    """
+    if endpoint != 'static' or not config.ASSET_FINGERPRINTING_ENABLED or VERSION_ARG in values:
+        return
+    version = current_app.extensions['asset_manifest'].version(values.get('filename'))
+    if version:
+        values[VERSION_ARG] = version
+
+def _precompressed_variants(filename):
+    """
+    Find up-to-date .br/.gz siblings of a static file
+
+    A sibling older than the file itself (the file was edited after
+    `flask assets compress`) is ignored.
+
+    Returns:
+        tuple: Encodings with a usable sibling, most preferred first
+    """
+    path = safe_join(current_app.static_folder, filename)
+    if path is None:
+        return ()
+    try:
+        source_mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return ()
+    variants = []
+    for encoding, extension in PRECOMPRESSED_EXTENSIONS.items():
+        try:
+            if os.stat(f'{path}.{extension}').st_mtime_ns >= source_mtime:
+                variants.append(encoding)
+        except OSError:
+            continue
+    return tuple(variants)
+
+def _self_versioned(filename):
+    """Whether a static file's name changes whenever its content does (poster derivatives)"""
+    return filename.startswith(config.POSTER_DERIVATIVE_DIR.rstrip('/') + '/')
+
+def serve_static(filename):
+    """
+    Static file view serving precompressed siblings and immutable versioned URLs
+
+    If the client accepts an encoding that `flask assets compress` wrote a
+    sibling for, that file is sent instead. A request whose ?v= matches the
+    file's current hash can be cached for ASSET_MAX_AGE; anything else (no
+    version, or a stale one from an old page) must be revalidated. Poster
+    derivatives carry their source's key in the file name, so they are
+    immutable even when generated after the manifest was built.
+    """
+    variants = _precompressed_variants(filename) if config.PRECOMPRESSED_ASSETS_ENABLED else ()
+    encoding = negotiate_encoding(variants) if variants else None
+    if encoding:
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        response = send_from_directory(
+            current_app.static_folder,
+            f'{filename}.{PRECOMPRESSED_EXTENSIONS[encoding]}',
+            mimetype=mimetype
+        )
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = current_app.send_static_file(filename)
+    if variants:
+        response.vary.add('Accept-Encoding')
+
+    version = current_app.extensions['asset_manifest'].version(filename)
+    if _self_versioned(filename) or (version and request.args.get(VERSION_ARG) == version):
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = config.ASSET_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.no_cache = True
+    return response
+
+def compress_static(static_folder, patterns):
+    """
+    Write .gz (and .br when brotli is installed) siblings of static files
+
+    Files whose siblings are already newer than the file are skipped.
+
+    Args:
+        static_folder (str): Absolute path of the static folder
+        patterns (tuple): Globs of the files to compress, e.g. '*.css'
+
+    Returns:
+        int: Number of compressed files written
+    """
+    written = 0
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            if not any(fnmatch.fnmatch(name, pattern) for pattern in patterns):
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            source_mtime = os.stat(path).st_mtime_ns
+
+            outputs = {'gz': lambda: gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                outputs['br'] = lambda: brotli.compress(data, mode=brotli.MODE_TEXT, quality=11)
+            for extension, compress in outputs.items():
+                target = f'{path}.{extension}'
+                if os.path.exists(target) and os.stat(target).st_mtime_ns >= source_mtime:
+                    continue
+                with open(target, 'wb') as f:
+                    f.write(compress())
+                written += 1
+    return written
+
+def init_assets(app):
+    """
+    Load the asset manifest and install the versioned static URLs
+
+    Args:
+        app (Flask): Application whose static folder is fingerprinted
+    """
+    manifest = AssetManifest(app.static_folder, config.ASSET_MANIFEST_PATH)
+    manifest.load()
+    app.extensions['asset_manifest'] = manifest
+    app.url_defaults(add_asset_version)
+    app.view_functions['static'] = serve_static
+    app.cli.add_command(assets_cli)
+    return manifest
+
+# flask assets <command>
+assets_cli = AppGroup('assets', help='Build static asset files.')
+
+@assets_cli.command('build')
+def build_manifest():
+    """Write the asset manifest (run after changing static files)"""
+    manifest = current_app.extensions['asset_manifest']
+    count = manifest.write()
+    click.echo(f"Wrote {manifest.manifest_path}: {count} files, digest {manifest.digest}")
+
+@assets_cli.command('compress')
+def compress_assets():
+    """Write precompressed .gz/.br siblings of text assets"""
+    written = compress_static(current_app.static_folder, config.PRECOMPRESS_PATTERNS)
+    encodings = 'gzip and brotli' if brotli is not None else 'gzip (install brotli for .br)'
+    click.echo(f"Wrote {written} compressed files ({encodings})")
+
+@assets_cli.command('posters')
+def build_posters():
+    """Generate resized/WebP poster copies (needs Pillow)"""
+    from utils.posters import Image
+    if Image is None:
+        raise click.ClickException("Pillow is not installed (pip install Pillow)")
+    poster_index = current_app.extensions['poster_index']
+    if poster_index.derivatives is None:
+        raise click.ClickException("POSTER_DERIVATIVES_ENABLED is off")
+    poster_index.derivatives.generate = True
+    count = poster_index.rebuild()
+    click.echo(f"Poster derivatives ready for {count} posters")
@@ -0,0 +1,187 @@
+"""
+Caching Utilities
+Bounded LRU + TTL cache whose entries are dropped by tag
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+# Every cache created in this process, so writes can invalidate all of them
+_caches = []
+
+# Per-thread flag set by skip_caching() while a cached function runs
+_local = threading.local()
+
+class TaggedCache:
+    """
+    Thread-safe LRU cache with a per-entry time-to-live
+
+    Each entry carries a set of tags such as ('title', 'Persona 5 Royal') or
+    ('review', 12). invalidate() drops every entry carrying any of the given
+    tags, so writers can evict exactly what they changed.
+    """
+
+    def __init__(self, name, max_entries, ttl):
+        """
+        Args:
+            name (str): Name used when reporting statistics
+            max_entries (int): Entries kept before the least recently used is evicted
+            ttl (float): Seconds an entry stays valid
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._tag_index = {}  # tag -> set of keys
+        self._epoch = 0  # Bumped by every invalidation
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def get(self, key):
+        """
+        Look up a key
+
+        Returns:
+            tuple: (found, value)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[1]
+                self._remove(key)
+            self.misses += 1
+            return False, None
+
+    def epoch(self):
+        """Return a token to pass to set() for values loaded after this call"""
+        return self._epoch
+
+    def set(self, key, value, tags=(), epoch=None):
+        """
+        Store a value
+
+        Args:
+            key: Hashable cache key
+            value: Value to cache (callers must treat it as read-only)
+            tags (iterable): Tags used to invalidate the entry
+            epoch (int, optional): Result of epoch() taken before the value was
+                loaded; the value is discarded if an invalidation happened since
+        """
+        with self._lock:
+            if epoch is not None and epoch != self._epoch:
+                return
+            if key in self._entries:
+                self._remove(key)
+            tags = frozenset(tags)
+            self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the given tags"""
+        with self._lock:
+            self._epoch += 1
+            for tag in tags:
+                for key in list(self._tag_index.get(tag, ())):
+                    self._remove(key)
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._tag_index.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: name, size, hits, misses, evictions and hit_ratio
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': self.hits / lookups if lookups else 0.0
+            }
+
+    def _remove(self, key):
+        """Remove one entry and its tag references (lock must be held)"""
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+def invalidate_tags(*tags):
+    """Drop entries carrying any of the given tags from every cache"""
+    for cache in _caches:
+        cache.invalidate(*tags)
+
+def all_cache_stats():
+    """
+    Returns:
+        list: stats() of every cache in this process
+    """
+    return [cache.stats() for cache in _caches]
+
+def skip_caching():
+    """
+    Stop the result of the current cached call from being stored
+
+    Call from an except block so error fallbacks (empty lists, None) are
+    returned to the caller but never served from the cache.
+    """
+    _local.skip = True
+
+def cached(cache, tags, enabled=True):
+    """
+    Decorator to cache a function's results in a TaggedCache
+
+    Args:
+        cache (TaggedCache): Cache to store results in
+        tags (callable): Called with the function's arguments, returns the
+            tags for the entry
+        enabled (bool): When False the function is returned unwrapped
+
+    Usage:
+        @cached(review_cache, tags=lambda review_id: [('review', review_id)])
+        def get_review_by_id(review_id):
+            ...
+    """
+    def decorator(func):
+        if not enabled:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            found, value = cache.get(key)
+            if found:
+                return value
+
+            epoch = cache.epoch()
+            _local.skip = False
+            value = func(*args, **kwargs)
+            if not _local.skip:
+                cache.set(key, value, tags(*args, **kwargs), epoch=epoch)
+            _local.skip = False
+            return value
+        return wrapper
+    return decorator
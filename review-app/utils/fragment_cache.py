@@ -0,0 +1,64 @@
+"""
+Fragment Cache
+Jinja {% cache %} tag storing rendered HTML fragments in a TaggedCache
+"""
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+from utils.cache import TaggedCache
+import config
+
+# Rendered fragments; review writes drop them through invalidate_tags()
+fragment_cache = TaggedCache(
+    'fragments',
+    max_entries=config.FRAGMENT_CACHE_MAX_ENTRIES,
+    ttl=config.FRAGMENT_CACHE_TTL
+)
+
+class FragmentCacheExtension(Extension):
+    """
+    Cache the rendered output of a template block
+
+    The key is the tag's comma-separated arguments; include everything the
+    block's output depends on (e.g. a review's id and updated_at). Optional
+    tags let writes invalidate the fragment.
+
+    Usage:
+        {% cache 'review-card', review.id, review.updated_at tags [('review', review.id)] %}
+            ... card markup ...
+        {% endcache %}
+
+    Never cache output that depends on the session (CSRF tokens, owner-only
+    buttons); keep such parts outside the block.
+    """
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        tags = nodes.Const(None)
+        if parser.stream.skip_if('name:tags'):
+            tags = parser.parse_expression()
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render_cached', [nodes.Tuple(key, 'load'), tags]),
+            [], [], body
+        ).set_lineno(lineno)
+
+    def _render_cached(self, key, tags, caller):
+        """Return the cached fragment, rendering and storing it on a miss"""
+        if not config.FRAGMENT_CACHE_ENABLED:
+            return caller()
+
+        found, html = fragment_cache.get(key)
+        if found:
+            return html
+
+        epoch = fragment_cache.epoch()
+        html = Markup(caller())
+        fragment_cache.set(key, html, tags or (), epoch=epoch)
+        return html
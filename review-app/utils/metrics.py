@@ -0,0 +1,394 @@
+"""
+Metrics Utilities
+Request, SQL, bcrypt and cache instrumentation exported in Prometheus text format
+"""
+
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from flask import Response, abort, g, has_request_context, request
+import config
+from models.db import add_statement_observer
+from utils.cache import all_cache_stats
+
+logger = logging.getLogger(__name__)
+
+# Every metric, in the order they are exported
+_metrics = []
+
+# Per-thread sample tables: each thread only writes its own dict, so the
+# request path never takes a lock. Collection copies them (dict.copy() is
+# atomic under the GIL) and folds the tables of finished threads into _retired.
+_shards = []  # (thread, samples)
+_retired = {}
+_shards_lock = threading.Lock()
+_local = threading.local()
+
+# New shards registered between folds of dead threads' tables, so servers
+# that start a thread per request stay bounded even if /metrics is never scraped
+_FOLD_EVERY = 64
+_registrations = 0
+
+def _shard():
+    """Return the current thread's sample table, creating it on first use"""
+    global _registrations
+    samples = getattr(_local, 'samples', None)
+    if samples is None:
+        samples = _local.samples = {}
+        with _shards_lock:
+            _shards.append((threading.current_thread(), samples))
+            _registrations += 1
+            if _registrations % _FOLD_EVERY == 0:
+                _fold_dead_shards()
+    return samples
+
+def _fold_dead_shards():
+    """Merge the tables of finished threads into _retired (hold _shards_lock)"""
+    live = []
+    for thread, samples in _shards:
+        if thread.is_alive():
+            live.append((thread, samples))
+        else:
+            # The thread is gone, so nothing writes these samples any more
+            _merge_into(_retired, samples)
+    _shards[:] = live
+
+class Counter:
+    """Monotonically increasing value per label set"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        """
+        Args:
+            name (str): Metric name
+            documentation (str): HELP text
+            labelnames (tuple): Label names; inc()/observe() take values in this order
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        _metrics.append(self)
+
+    def inc(self, *labels, amount=1):
+        """Add `amount` to the value for the given label values"""
+        samples = _shard()
+        key = (self.name, labels)
+        samples[key] = samples.get(key, 0) + amount
+
+    def merge(self, total, value):
+        """Combine two samples of this metric"""
+        return total + value
+
+    def format(self, labels, value):
+        """Render one sample as exposition lines"""
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}']
+
+class Gauge(Counter):
+    """Value that can go up and down (summed over threads and workers)"""
+
+    kind = 'gauge'
+
+    def dec(self, *labels, amount=1):
+        """Subtract `amount` from the value for the given label values"""
+        self.inc(*labels, amount=-amount)
+
+class Histogram(Counter):
+    """Distribution of observed values in cumulative buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        """
+        Args:
+            buckets (tuple): Upper bounds, ascending (+Inf is added)
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        """Record one observation for the given label values"""
+        samples = _shard()
+        key = (self.name, labels)
+        counts = samples.get(key)
+        if counts is None:
+            # One slot per bucket plus +Inf, then sum and count
+            counts = samples[key] = [0] * (len(self.buckets) + 3)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def merge(self, total, value):
+        return [a + b for a, b in zip(total, value)]
+
+    def format(self, labels, value):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), value):
+            cumulative += count
+            le = bound if bound == '+Inf' else _format_value(bound)
+            names = self.labelnames + ('le',)
+            lines.append(f'{self.name}_bucket{_format_labels(names, labels + (le,))} {cumulative}')
+        label_text = _format_labels(self.labelnames, labels)
+        lines.append(f'{self.name}_sum{label_text} {_format_value(value[-2])}')
+        lines.append(f'{self.name}_count{label_text} {value[-1]}')
+        return lines
+
+def _format_labels(names, values):
+    """Render {name="value",...} with Prometheus escaping"""
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+def _format_value(value):
+    """Render a number the way Prometheus expects"""
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+# Request metrics
+REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by endpoint, method and status',
+    ('blueprint', 'endpoint', 'method', 'status')
+)
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'Time to handle a request, including streaming the body',
+    ('blueprint', 'endpoint', 'method'),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'Requests currently being handled'
+)
+
+# Database metrics
+DB_STATEMENTS = Counter('db_statements_total', 'SQL statements executed')
+DB_SECONDS = Counter('db_statement_seconds_total', 'Time spent executing and fetching SQL statements')
+REQUEST_DB_STATEMENTS = Histogram(
+    'http_request_db_statements', 'SQL statements executed per request',
+    ('blueprint', 'endpoint'),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100)
+)
+REQUEST_DB_SECONDS = Histogram(
+    'http_request_db_seconds', 'Time spent in SQL per request',
+    ('blueprint', 'endpoint'),
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+
+# Password hashing
+BCRYPT_SECONDS = Histogram(
+    'bcrypt_duration_seconds', 'Time a bcrypt hash or check ran on the hashing pool',
+    ('operation',),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5)
+)
+
+# Caches (read from TaggedCache.stats() when metrics are collected)
+CACHE_HITS = Counter('cache_hits_total', 'Cache lookups that found an entry', ('cache',))
+CACHE_MISSES = Counter('cache_misses_total', 'Cache lookups that found nothing', ('cache',))
+CACHE_EVICTIONS = Counter('cache_evictions_total', 'Entries evicted to stay under the size limit', ('cache',))
+CACHE_ENTRIES = Gauge('cache_entries', 'Entries currently cached', ('cache',))
+
+def _cache_samples():
+    """Current statistics of every cache in this process"""
+    samples = {}
+    for stats in all_cache_stats():
+        labels = (stats['name'],)
+        samples[(CACHE_HITS.name, labels)] = stats['hits']
+        samples[(CACHE_MISSES.name, labels)] = stats['misses']
+        samples[(CACHE_EVICTIONS.name, labels)] = stats['evictions']
+        samples[(CACHE_ENTRIES.name, labels)] = stats['size']
+    return samples
+
+def _merge_into(total, samples):
+    """Add a sample table into another"""
+    for key, value in samples.items():
+        metric = _by_name[key[0]]
+        if key in total:
+            total[key] = metric.merge(total[key], value)
+        else:
+            total[key] = list(value) if isinstance(value, list) else value
+
+def process_samples():
+    """
+    Collect this process's samples from every thread
+
+    Returns:
+        dict: (metric name, label values) -> value
+    """
+    with _shards_lock:
+        _fold_dead_shards()
+        total = {}
+        _merge_into(total, _retired)
+        for _, samples in _shards:
+            _merge_into(total, samples.copy())
+    _merge_into(total, _cache_samples())
+    return total
+
+def _snapshot_path(pid):
+    """Path of a worker's samples file in multiprocess mode"""
+    return os.path.join(config.METRICS_MULTIPROCESS_DIR, f'metrics-{pid}.json')
+
+def write_snapshot():
+    """Save this process's samples for the other workers' /metrics (multiprocess mode)"""
+    samples = [[name, list(labels), value] for (name, labels), value in process_samples().items()]
+    path = _snapshot_path(os.getpid())
+    temp_path = f'{path}.tmp'
+    try:
+        with open(temp_path, 'w') as f:
+            json.dump(samples, f)
+        os.replace(temp_path, path)
+    except OSError:
+        logger.exception("Error writing metrics snapshot")
+
+def _pid_alive(pid):
+    """Check whether a worker process still exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def collect():
+    """
+    Samples to export: this process's, or every worker's in multiprocess mode
+
+    Counters of exited workers are kept so totals never go backwards; their
+    gauges are dropped.
+
+    Returns:
+        dict: (metric name, label values) -> value
+    """
+    if not config.METRICS_MULTIPROCESS_DIR:
+        return process_samples()
+
+    write_snapshot()
+    total = {}
+    for path in glob.glob(_snapshot_path('*')):
+        try:
+            pid = int(os.path.basename(path)[len('metrics-'):-len('.json')])
+            with open(path) as f:
+                samples = json.load(f)
+        except (OSError, ValueError):
+            logger.exception("Error reading metrics snapshot %s", path)
+            continue
+        alive = _pid_alive(pid)
+        worker = {}
+        for name, labels, value in samples:
+            metric = _by_name.get(name)
+            if metric is None or (metric.kind == 'gauge' and not alive):
+                continue
+            worker[(name, tuple(labels))] = value
+        _merge_into(total, worker)
+    return total
+
+def render_metrics(samples):
+    """
+    Render samples in the Prometheus text exposition format
+
+    Args:
+        samples (dict): Result of collect()
+
+    Returns:
+        str: Exposition text
+    """
+    by_metric = {}
+    for (name, labels), value in samples.items():
+        by_metric.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for metric in _metrics:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for labels, value in sorted(by_metric.get(metric.name, ()), key=lambda item: item[0]):
+            lines.extend(metric.format(labels, value))
+    return '\n'.join(lines) + '\n'
+
+_by_name = {metric.name: metric for metric in _metrics}
+
+def _observe_statement(sql, params, seconds, executed, rows):
+    """Statement observer feeding the SQL counters (and the current request's totals)"""
+    if executed:
+        DB_STATEMENTS.inc()
+    DB_SECONDS.inc(amount=seconds)
+    if has_request_context() and 'metrics_started' in g:
+        if executed:
+            g.metrics_db_statements += 1
+        g.metrics_db_seconds += seconds
+
+def _start_request():
+    """before_request hook"""
+    g.metrics_started = time.perf_counter()
+    g.metrics_db_statements = 0
+    g.metrics_db_seconds = 0.0
+    REQUESTS_IN_PROGRESS.inc()
+
+def _finish_request(response):
+    """after_request hook: record the request once its body has been sent"""
+    if 'metrics_started' not in g:
+        return response
+    started = g.metrics_started
+    blueprint = request.blueprint or ''
+    # Unmatched URLs share one label value so 404 scans cannot add series
+    endpoint = request.endpoint or 'unmatched'
+    method = request.method
+    status = str(response.status_code)
+    state = g._get_current_object()  # The proxy is unbound once the response is closed
+
+    def finished():
+        REQUESTS_IN_PROGRESS.dec()
+        REQUESTS.inc(blueprint, endpoint, method, status)
+        REQUEST_SECONDS.observe(time.perf_counter() - started, blueprint, endpoint, method)
+        REQUEST_DB_STATEMENTS.observe(state.metrics_db_statements, blueprint, endpoint)
+        REQUEST_DB_SECONDS.observe(state.metrics_db_seconds, blueprint, endpoint)
+
+    if response.direct_passthrough:
+        # File responses go straight to the server, which never calls
+        # the response's close callbacks; there is no body left to generate
+        finished()
+    else:
+        response.call_on_close(finished)
+    return response
+
+def metrics_view():
+    """GET /metrics"""
+    allowed = config.METRICS_ALLOWED_IPS
+    if allowed is not None and request.remote_addr not in allowed:
+        abort(404)
+    body = render_metrics(collect())
+    response = Response(body, mimetype='text/plain')
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def _start_snapshot_thread(interval):
+    """Write this worker's snapshot every `interval` seconds"""
+    def run():
+        while True:
+            time.sleep(interval)
+            write_snapshot()
+
+    threading.Thread(target=run, name='metrics-snapshot', daemon=True).start()
+
+def init_metrics(app):
+    """
+    Install the request hooks, the SQL observer and the /metrics endpoint
+
+    Args:
+        app (Flask): Application to instrument
+    """
+    add_statement_observer(_observe_statement)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    if config.METRICS_MULTIPROCESS_DIR:
+        os.makedirs(config.METRICS_MULTIPROCESS_DIR, exist_ok=True)
+        _start_snapshot_thread(config.METRICS_SNAPSHOT_INTERVAL)
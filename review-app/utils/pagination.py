@@ -0,0 +1,50 @@
+"""
+Pagination Utilities
+Encodes and decodes opaque keyset cursors for paged listings
+"""
+
+import base64
+import json
+
+def encode_cursor(*values):
+    """
+    Encode the sort key of a row into an opaque, URL-safe cursor
+
+    Args:
+        *values: Sort key values, e.g. (review_date, id)
+
+    Returns:
+        str: Cursor string
+    """
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, types):
+    """
+    Decode a cursor produced by encode_cursor()
+
+    Args:
+        cursor (str): Cursor from a query string (may be None)
+        types (tuple): Expected type of each key value, e.g. (str, int)
+
+    Returns:
+        tuple: Sort key values, None if the cursor is missing or malformed
+    """
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError):
+        return None
+
+    if not isinstance(values, list) or len(values) != len(types):
+        return None
+
+    for value, expected in zip(values, types):
+        # bool is a subclass of int, so reject it explicitly
+        if not isinstance(value, expected) or isinstance(value, bool):
+            return None
+
+    return tuple(values)
@@ -0,0 +1,292 @@
+"""
+Poster Utilities
+Maps titles to poster images without probing the filesystem on every render
+"""
+
+import base64
+import json
+import logging
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from io import BytesIO
+
+logger = logging.getLogger(__name__)
+
+# Optional: Pillow generates the resized/WebP poster derivatives
+try:
+    from PIL import Image, ImageFilter
+except ImportError:
+    Image = None
+
+# Poster file extensions in order of preference
+POSTER_EXTENSIONS = ('png', 'jpg', 'jpeg')
+
+@lru_cache(maxsize=4096)
+def poster_basename(title):
+    """
+    Build the poster filename (without extension) for a title
+
+    Lowercase, spaces become underscores, and ':' and "'" are stripped,
+    e.g. 'Persona Q: Shadow of the Labyrinth' -> 'persona_q_shadow_of_the_labyrinth'
+
+    Args:
+        title (str): Movie/game title
+
+    Returns:
+        str: Poster basename
+    """
+    return (
+        title.lower()
+             .replace(' ', '_')
+             .replace(':', '')
+             .replace("'", '')
+    )
+
+class PosterDerivatives:
+    """
+    Resized JPEG/WebP copies and a blurred placeholder for each poster
+
+    Derivatives are written to cache_dir under names that include the source
+    file's mtime, so an edited poster gets new files (and new URLs) and the
+    old ones are deleted. Generating needs Pillow; without it, derivatives
+    already on disk (e.g. built by `flask assets posters`) are still used.
+    """
+
+    def __init__(self, cache_dir, static_prefix, widths, quality=80, placeholder_width=16,
+                 generate=True):
+        """
+        Args:
+            cache_dir (str): Absolute path of the derivative directory
+            static_prefix (str): Path of that directory relative to the static folder
+            widths (tuple): Target widths in pixels (wider than the source are skipped)
+            quality (int): JPEG/WebP quality
+            placeholder_width (int): Width of the inline blurred placeholder
+            generate (bool): Create missing derivatives when Pillow is installed
+        """
+        self.cache_dir = cache_dir
+        self.static_prefix = static_prefix
+        self.widths = tuple(sorted(widths))
+        self.quality = quality
+        self.placeholder_width = placeholder_width
+        self.generate = generate
+
+    def get(self, source_path, basename):
+        """
+        Load (or create) the derivatives of a poster
+
+        Args:
+            source_path (str): Absolute path of the original poster
+            basename (str): Poster basename
+
+        Returns:
+            dict: width, height, color (CSS hex), placeholder (data URI) and
+                  jpeg/webp lists of (static path, width); None if unavailable
+        """
+        try:
+            key = f'{os.stat(source_path).st_mtime_ns:x}'
+        except OSError:
+            return None
+        meta_path = os.path.join(self.cache_dir, f'{basename}-{key}.json')
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+        if not self.generate or Image is None:
+            return None
+        try:
+            derivatives = self._generate(source_path, basename, key)
+        except Exception:
+            logger.exception("Error generating poster derivatives for %s", basename)
+            return None
+        self._write_atomic(meta_path, json.dumps(derivatives).encode())
+        self._remove_stale(basename, key)
+        return derivatives
+
+    def _generate(self, source_path, basename, key):
+        """Write the resized copies and build the metadata"""
+        with Image.open(source_path) as source:
+            image = source.convert('RGB')
+        width, height = image.size
+
+        # Widths within 10% of the original add nothing over the original size
+        widths = [w for w in self.widths if w < width * 0.9] + [width]
+        jpeg, webp = [], []
+        for target in widths:
+            resized = image if target == width else image.resize(
+                (target, round(height * target / width)), Image.Resampling.LANCZOS
+            )
+            for fmt, extension, found in (('JPEG', 'jpg', jpeg), ('WEBP', 'webp', webp)):
+                filename = f'{basename}-{key}-{target}w.{extension}'
+                self._save(resized, os.path.join(self.cache_dir, filename), fmt)
+                found.append((f'{self.static_prefix}/{filename}', target))
+
+        # Tiny blurred copy inlined in the page while the real image loads
+        tiny = image.resize(
+            (self.placeholder_width, max(1, round(height * self.placeholder_width / width))),
+            Image.Resampling.BOX
+        ).filter(ImageFilter.GaussianBlur(1))
+        # (WebP: about 150 bytes, a JPEG's headers alone are over 500)
+        placeholder = self._encode(tiny, 'WEBP', quality=40)
+        red, green, blue = image.resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
+
+        return {
+            'width': width,
+            'height': height,
+            'color': f'#{red:02x}{green:02x}{blue:02x}',
+            'placeholder': 'data:image/webp;base64,' + base64.b64encode(placeholder).decode(),
+            'jpeg': jpeg,
+            'webp': webp
+        }
+
+    def _save(self, image, path, fmt):
+        """Encode an image and write it atomically"""
+        self._write_atomic(path, self._encode(image, fmt, self.quality))
+
+    @staticmethod
+    def _encode(image, fmt, quality):
+        """Encode an image to bytes"""
+        buffer = BytesIO()
+        if fmt == 'JPEG':
+            image.save(buffer, fmt, quality=quality, optimize=True, progressive=True)
+        else:
+            image.save(buffer, fmt, quality=quality, method=6)
+        return buffer.getvalue()
+
+    def _write_atomic(self, path, data):
+        """Write via a temporary file so other workers never read a partial file"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def _remove_stale(self, basename, key):
+        """Delete derivatives of earlier versions of a poster"""
+        # Matches only this poster's files, not those of a basename it prefixes
+        # (e.g. 'persona_3' / 'persona_3-reload')
+        pattern = re.compile(re.escape(basename) + r'-([0-9a-f]+)(?:-\d+w\.(?:jpg|webp)|\.json)$')
+        try:
+            with os.scandir(self.cache_dir) as entries:
+                for entry in entries:
+                    match = pattern.match(entry.name)
+                    if match and match.group(1) != key:
+                        os.remove(entry.path)
+        except OSError:
+            pass
+
+class PosterIndex:
+    """
+    In-memory map of poster basename -> static path
+
+    Built once from the posters directory and rebuilt only when the
+    directory's mtime changes (a poster was added, removed or renamed).
+    The mtime is checked at most once per check_interval seconds.
+    """
+
+    def __init__(self, posters_dir, static_prefix='images/posters', check_interval=5,
+                 derivatives=None):
+        """
+        Args:
+            posters_dir (str): Absolute path of the posters directory
+            static_prefix (str): Path of that directory relative to the static folder
+            check_interval (float): Minimum seconds between mtime checks
+            derivatives (PosterDerivatives, optional): Resized copies to offer
+        """
+        self.posters_dir = posters_dir
+        self.static_prefix = static_prefix
+        self.check_interval = check_interval
+        self.derivatives = derivatives
+        self._paths = {}
+        self._images = {}
+        self._mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def lookup(self, title):
+        """
+        Find the poster for a title
+
+        Args:
+            title (str): Movie/game title
+
+        Returns:
+            str: Path relative to the static folder, None if no poster exists
+        """
+        self._refresh_if_changed()
+        return self._paths.get(poster_basename(title))
+
+    def image(self, title):
+        """
+        Find the resized copies of a title's poster
+
+        Args:
+            title (str): Movie/game title
+
+        Returns:
+            dict: See PosterDerivatives.get(), None if the title has no
+                  poster or its derivatives are not available
+        """
+        self._refresh_if_changed()
+        return self._images.get(poster_basename(title))
+
+    def rebuild(self):
+        """
+        Rescan the posters directory and replace the index
+
+        Returns:
+            int: Number of posters with derivatives
+        """
+        with self._lock:
+            self._mtime = self._directory_mtime()
+            self._checked_at = time.monotonic()
+            paths = self._scan()
+            images = {}
+            if self.derivatives is not None:
+                for basename, path in paths.items():
+                    source = os.path.join(self.posters_dir, path.rsplit('/', 1)[-1])
+                    found = self.derivatives.get(source, basename)
+                    if found:
+                        images[basename] = found
+            self._paths = paths
+            self._images = images
+        return len(images)
+
+    def _refresh_if_changed(self):
+        """Rebuild the index if the directory changed since the last scan"""
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        if self._directory_mtime() != self._mtime:
+            self.rebuild()
+
+    def _directory_mtime(self):
+        """Return the directory's mtime, None if it does not exist"""
+        try:
+            return os.stat(self.posters_dir).st_mtime_ns
+        except OSError:
+            return None
+
+    def _scan(self):
+        """Map each poster basename to its preferred file"""
+        found = {}  # basename -> (preference, filename)
+        try:
+            with os.scandir(self.posters_dir) as entries:
+                for entry in entries:
+                    basename, _, ext = entry.name.rpartition('.')
+                    if not basename or ext not in POSTER_EXTENSIONS or not entry.is_file():
+                        continue
+                    preference = POSTER_EXTENSIONS.index(ext)
+                    if basename not in found or preference < found[basename][0]:
+                        found[basename] = (preference, entry.name)
+        except OSError:
+            return {}
+
+        return {
+            basename: f'{self.static_prefix}/{filename}'
+            for basename, (_, filename) in found.items()
+        }
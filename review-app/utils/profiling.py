@@ -0,0 +1,134 @@
+"""
+Profiling Utilities
+Stack-sampling CPU profiler and tracemalloc snapshot diffs for a live worker
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# One profile or memory operation at a time per process
+_profile_lock = threading.Lock()
+_memory_lock = threading.Lock()
+
+class ProfilerBusy(Exception):
+    """Raised when a profile or memory snapshot is already running in this process"""
+
+def _frame_label(frame):
+    """Name a stack frame as function (file:first line)"""
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+def sample_stacks(seconds, interval, include_idle=True):
+    """
+    Sample every thread's stack for a while
+
+    Nothing is installed in the interpreter (no sys.setprofile/settrace);
+    the calling thread wakes every `interval` seconds and reads
+    sys._current_frames(), so other threads only pay for the GIL hand-off.
+
+    Args:
+        seconds (float): How long to sample
+        interval (float): Seconds between samples
+        include_idle (bool): Keep stacks of threads blocked in a wait
+            (their innermost frame is in threading, queue, selectors or socket)
+
+    Returns:
+        Counter: Collapsed stack ('outer;...;inner') -> number of samples
+
+    Raises:
+        ProfilerBusy: If another profile is running
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+
+    idle_files = ('threading.py', 'queue.py', 'selectors.py', 'socket.py', 'socketserver.py')
+    stacks = Counter()
+    own_thread = threading.get_ident()
+    try:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                if not include_idle and os.path.basename(frame.f_code.co_filename) in idle_files:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                stacks[';'.join(reversed(labels))] += 1
+            time.sleep(interval)
+    finally:
+        _profile_lock.release()
+    return stacks
+
+def format_collapsed(stacks):
+    """
+    Render stacks in the collapsed format read by flamegraph.pl and speedscope
+
+    Args:
+        stacks (Counter): Result of sample_stacks()
+
+    Returns:
+        str: One 'frame;frame;frame count' line per stack, most frequent first
+    """
+    return ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+
+def memory_snapshot(seconds, frames, key_type='lineno', limit=25):
+    """
+    Report the allocation sites that grew or shrank over a window
+
+    tracemalloc runs only for the window: it is started (keeping `frames`
+    frames per allocation), a baseline is taken, and after `seconds` the
+    heap is compared with it and tracing stops again, so an idle worker pays
+    nothing. If tracing was already on (e.g. PYTHONTRACEMALLOC) it is left on.
+
+    Args:
+        seconds (float): How long to trace
+        frames (int): Frames stored per allocation
+        key_type (str): Group by 'lineno', 'filename' or 'traceback'
+        limit (int): Allocation sites reported
+
+    Returns:
+        str: Report text
+
+    Raises:
+        ProfilerBusy: If another memory snapshot is running
+    """
+    if not _memory_lock.acquire(blocking=False):
+        raise ProfilerBusy("A memory snapshot is already running")
+
+    started = not tracemalloc.is_tracing()
+    try:
+        if started:
+            tracemalloc.start(frames)
+        baseline = _filtered(tracemalloc.take_snapshot())
+        time.sleep(seconds)
+        snapshot = _filtered(tracemalloc.take_snapshot())
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+        _memory_lock.release()
+
+    lines = [f'Traced memory: current {current / 1024:.1f} KiB, peak {peak / 1024:.1f} KiB',
+             f'Top {limit} allocation sites by growth over {seconds:g}s:', '']
+    for stat in snapshot.compare_to(baseline, key_type)[:limit]:
+        lines.append(
+            f'{stat.size_diff / 1024:+10.1f} KiB {stat.count_diff:+8d} blocks  '
+            f'(total {stat.size / 1024:.1f} KiB in {stat.count} blocks)'
+        )
+        lines.extend(f'    {line}' for line in stat.traceback.format())
+    return '\n'.join(lines) + '\n'
+
+def _filtered(snapshot):
+    """Leave out allocations made by tracemalloc and the import system"""
+    return snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    ))
@@ -6,8 +6,52 @@ Handles password hashing, CSRF token generation, and input sanitization
 import bcrypt
 import secrets
 import html
-from config import BCRYPT_LOG_ROUNDS
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import BCRYPT_LOG_ROUNDS, BCRYPT_WORKERS, BCRYPT_MAX_PENDING
+from utils.metrics import BCRYPT_SECONDS
+from utils.tracing import traced
 
+class HashingUnavailable(Exception):
+    """Raised when every bcrypt worker is busy and the wait queue is full"""
+
+# bcrypt releases the GIL while hashing, so a small thread pool runs hashes in
+# parallel without tying up more than BCRYPT_WORKERS cores. The semaphore
+# caps running + queued hashes; beyond that callers fail fast.
+_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix='bcrypt')
+_slots = threading.BoundedSemaphore(BCRYPT_WORKERS + BCRYPT_MAX_PENDING)
+
+def _timed(operation, func, *args):
+    """Run a bcrypt call, recording how long it took (excluding time queued)"""
+    start = time.perf_counter()
+    try:
+        return func(*args)
+    finally:
+        BCRYPT_SECONDS.observe(time.perf_counter() - start, operation)
+
+def _run_bounded(operation, func, *args):
+    """
+    Run a bcrypt call on the hashing pool and wait for the result
+
+    Args:
+        operation (str): 'hash' or 'verify', for the bcrypt metrics
+
+    Raises:
+        HashingUnavailable: If the pool and its queue are full
+    """
+    if not _slots.acquire(blocking=False):
+        raise HashingUnavailable("Password hashing is at capacity")
+
+    try:
+        future = _executor.submit(_timed, operation, func, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future.result()
+
+@traced('bcrypt.hash')
 def hash_password(password):
     """
     Hash a password using bcrypt
@@ -17,12 +61,16 @@ def hash_password(password):
 
     Returns:
         str: Hashed password (60 characters)
+
+    Raises:
+        HashingUnavailable: If the hashing pool is saturated
     """
     password_bytes = password.encode('utf-8')
     salt = bcrypt.gensalt(rounds=BCRYPT_LOG_ROUNDS)
-    hashed = bcrypt.hashpw(password_bytes, salt)
+    hashed = _run_bounded('hash', bcrypt.hashpw, password_bytes, salt)
     return hashed.decode('utf-8')
 
+@traced('bcrypt.verify')
 def verify_password(password, password_hash):
     """
     Verify a password against its hash using constant-time comparison
@@ -33,10 +81,29 @@ def verify_password(password, password_hash):
 
     Returns:
         bool: True if password matches, False otherwise
+
+    Raises:
+        HashingUnavailable: If the hashing pool is saturated
     """
     password_bytes = password.encode('utf-8')
     hash_bytes = password_hash.encode('utf-8')
-    return bcrypt.checkpw(password_bytes, hash_bytes)
+    return _run_bounded('verify', bcrypt.checkpw, password_bytes, hash_bytes)
+
+def needs_rehash(password_hash):
+    """
+    Check whether a stored hash uses a different cost factor than configured
+
+    Args:
+        password_hash (str): Stored bcrypt hash, e.g. '$2b$12$...'
+
+    Returns:
+        bool: True if the hash should be regenerated at BCRYPT_LOG_ROUNDS
+    """
+    try:
+        rounds = int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return False
+    return rounds != BCRYPT_LOG_ROUNDS
 
 def generate_csrf_token():
     """
@@ -0,0 +1,147 @@
+"""
+SQL Tracing
+Per-request ledger of SQL statements with slow-query and repeated-query logging
+"""
+
+import logging
+import re
+import sqlite3
+from collections import Counter
+from functools import lru_cache
+from flask import g, has_request_context, request
+import config
+from models.db import add_statement_observer, get_db_connection
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERALS = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERALS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+@lru_cache(maxsize=1024)
+def normalize_sql(sql):
+    """
+    Reduce a statement to its shape
+
+    Literals become ?, lists of placeholders collapse to (?...) and
+    whitespace is collapsed, so statements that differ only in their
+    values compare equal.
+
+    Args:
+        sql (str): Statement text
+
+    Returns:
+        str: Normalised statement
+    """
+    shape = _STRING_LITERALS.sub('?', sql)
+    shape = _NUMBER_LITERALS.sub('?', shape)
+    shape = _PLACEHOLDER_LISTS.sub('(?...)', shape)
+    return _WHITESPACE.sub(' ', shape).strip()
+
+def _record_statement(sql, params, seconds, executed, rows):
+    """Statement observer appending to the current request's ledger"""
+    if not has_request_context():
+        return
+    ledger = g.get('sql_ledger')
+    if ledger is None or g.get('sql_trace_paused'):
+        return
+
+    if executed:
+        ledger.append({
+            'sql': normalize_sql(sql),
+            'statement': sql,
+            'params': params,
+            'seconds': seconds,
+            'rows': rows
+        })
+        return
+
+    # A fetch belongs to the latest execution of the same statement
+    for entry in reversed(ledger):
+        if entry['statement'] == sql:
+            entry['seconds'] += seconds
+            entry['rows'] += rows
+            break
+
+def get_sql_ledger():
+    """
+    Statements run so far by the current request
+
+    Returns:
+        list: dicts with sql (normalised), statement, params, seconds and
+              rows; empty outside a traced request
+    """
+    if not has_request_context():
+        return []
+    return g.get('sql_ledger') or []
+
+def explain(statement, params):
+    """
+    Get the query plan of a statement
+
+    Args:
+        statement (str): Statement text
+        params: Its parameters
+
+    Returns:
+        str: One plan step per line, None if the plan could not be read
+    """
+    g.sql_trace_paused = True
+    try:
+        rows = get_db_connection().execute(f'EXPLAIN QUERY PLAN {statement}', params or ()).fetchall()
+    except sqlite3.Error:
+        return None
+    finally:
+        g.sql_trace_paused = False
+    return '\n'.join(f'  {row["detail"]}' for row in rows)
+
+def _start_request():
+    """before_request hook starting an empty ledger"""
+    g.sql_ledger = []
+
+def _finish_request(exception=None):
+    """teardown_request hook logging slow and repeated statements"""
+    ledger = g.pop('sql_ledger', None)
+    if not ledger:
+        return
+    endpoint = request.endpoint or request.path
+
+    slow_seconds = config.SQL_SLOW_QUERY_MS / 1000
+    for entry in ledger:
+        if entry['seconds'] >= slow_seconds:
+            plan = explain(entry['statement'], entry['params'])
+            logger.warning(
+                "Slow query in %s (%.1f ms, %d rows): %s\n%s",
+                endpoint, entry['seconds'] * 1000, entry['rows'], entry['sql'],
+                plan or '  (no plan)'
+            )
+
+    # The same statement and parameters: the result could have been reused
+    identical = Counter((entry['statement'], repr(entry['params'])) for entry in ledger)
+    for (statement, params), count in identical.items():
+        if count > 1:
+            logger.warning(
+                "Identical query ran %d times in %s: %s params=%s",
+                count, endpoint, normalize_sql(statement), params
+            )
+
+    # The same shape with different parameters: usually a query in a loop (N+1)
+    shapes = Counter(entry['sql'] for entry in ledger)
+    for shape, count in shapes.items():
+        if count >= config.SQL_REPEATED_QUERY_THRESHOLD:
+            logger.warning(
+                "Query ran %d times in %s (N+1?): %s",
+                count, endpoint, shape
+            )
+
+def init_sql_trace(app):
+    """
+    Trace every request's statements
+
+    Args:
+        app (Flask): Application to trace
+    """
+    add_statement_observer(_record_statement)
+    app.before_request(_start_request)
+    app.teardown_request(_finish_request)
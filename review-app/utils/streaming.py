@@ -0,0 +1,47 @@
+"""
+Streaming Utilities
+Sends rendered pages to the browser while the rest of the template renders
+"""
+
+from flask import Response, get_flashed_messages, stream_template
+import config
+
+def stream_page(template_name, **context):
+    """
+    Render a template as a streamed response
+
+    The response headers (and the session cookie) are sent before the body
+    renders, so anything that changes the session must happen first. Flashed
+    messages are popped here; the template's get_flashed_messages() call then
+    reads the popped copy. CSRF tokens should be passed in the context.
+
+    Args:
+        template_name (str): Template to render
+        **context: Template variables
+
+    Returns:
+        Response: Streamed HTML response
+    """
+    get_flashed_messages(with_categories=True)
+    chunks = stream_template(template_name, **context)
+    return Response(_coalesce(chunks, config.TEMPLATE_STREAM_BUFFER), mimetype='text/html')
+
+def _coalesce(chunks, size):
+    """
+    Join Jinja's many small output chunks into writes of about `size` characters
+
+    Args:
+        chunks (iterable): Rendered template chunks
+        size (int): Characters collected before each write
+    """
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
@@ -0,0 +1,285 @@
+"""
+Tracing Utilities
+Per-request span traces written as OTLP JSON lines to a rotating local file
+"""
+
+import contextvars
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import time
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+from flask import before_render_template, g, request, template_rendered
+import config
+
+# The trace of the request being handled, None when it is not sampled
+_trace = contextvars.ContextVar('trace', default=None)
+# The innermost open span
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+# Incoming request ids are echoed back only if they look like ids
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+# W3C trace context: version-traceid-parentid-flags
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+# OTLP span kinds and status codes
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# Finished traces, one OTLP JSON document per line
+_exporter = logging.getLogger('review_app.traces')
+_exporter.propagate = False
+
+class Span:
+    """One timed operation within a trace"""
+
+    __slots__ = ('name', 'span_id', 'parent_id', 'kind', 'start_ns', 'end_ns',
+                 'attributes', 'error')
+
+    def __init__(self, name, parent_id=None, kind=SPAN_KIND_INTERNAL, attributes=None):
+        self.name = name
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def end(self, error=None):
+        """Close the span, recording an exception if one ended it"""
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f'{type(error).__name__}: {error}'
+
+class Trace:
+    """Spans of one sampled request"""
+
+    def __init__(self, trace_id, parent_id=None):
+        """
+        Args:
+            trace_id (str): 32 hex characters
+            parent_id (str, optional): Caller's span id from an incoming traceparent
+        """
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.spans = []
+        self.templates = []  # (span, enclosing span) of open templates (see _template_started())
+
+    def start_span(self, name, kind=SPAN_KIND_INTERNAL, attributes=None):
+        """Open a span under the current one"""
+        parent = _current_span.get()
+        span = Span(name, parent.span_id if parent else self.parent_id, kind, attributes)
+        self.spans.append(span)
+        return span
+
+def _attribute(key, value):
+    """Encode one OTLP attribute"""
+    if isinstance(value, bool):
+        encoded = {'boolValue': value}
+    elif isinstance(value, int):
+        encoded = {'intValue': str(value)}
+    elif isinstance(value, float):
+        encoded = {'doubleValue': value}
+    else:
+        encoded = {'stringValue': str(value)}
+    return {'key': key, 'value': encoded}
+
+def _export(trace):
+    """Write a finished trace as one OTLP/JSON ExportTraceServiceRequest line"""
+    spans = []
+    for span in trace.spans:
+        encoded = {
+            'traceId': trace.trace_id,
+            'spanId': span.span_id,
+            'name': span.name,
+            'kind': span.kind,
+            'startTimeUnixNano': str(span.start_ns),
+            'endTimeUnixNano': str(span.end_ns or time.time_ns()),
+            'attributes': [_attribute(key, value) for key, value in span.attributes.items()],
+            'status': {'code': STATUS_ERROR, 'message': span.error} if span.error else {'code': STATUS_OK}
+        }
+        if span.parent_id:
+            encoded['parentSpanId'] = span.parent_id
+        spans.append(encoded)
+
+    document = {
+        'resourceSpans': [{
+            'resource': {'attributes': [_attribute('service.name', config.TRACE_SERVICE_NAME)]},
+            'scopeSpans': [{'scope': {'name': 'utils.tracing'}, 'spans': spans}]
+        }]
+    }
+    _exporter.info(json.dumps(document, separators=(',', ':')))
+
+class span:
+    """
+    Context manager timing a block as a child span of the current request
+
+    Does nothing when the request is not sampled.
+
+    Usage:
+        with span('posters.generate', poster=basename):
+            ...
+    """
+
+    def __init__(self, name, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self._span = None
+        self._token = None
+
+    def __enter__(self):
+        trace = _trace.get()
+        if trace is not None:
+            self._span = trace.start_span(self.name, attributes=self.attributes)
+            self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._span is not None:
+            self._span.end(exc)
+            _current_span.reset(self._token)
+        return False
+
+def traced(name=None):
+    """
+    Decorator recording each call of a function as a span
+
+    Args:
+        name (str, optional): Span name (default module.function)
+
+    Usage:
+        @traced()
+        def get_review_by_id(review_id):
+            ...
+    """
+    def decorator(func):
+        span_name = name or f'{func.__module__}.{func.__name__}'
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _trace.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _incoming_request_id():
+    """The caller's X-Request-ID if it is usable, otherwise a new id"""
+    request_id = request.headers.get(config.REQUEST_ID_HEADER, '')
+    if _REQUEST_ID.match(request_id):
+        return request_id
+    return secrets.token_hex(16)
+
+def _start_request():
+    """before_request hook: assign the request id and open the root span if sampled"""
+    g.request_id = _incoming_request_id()
+    # Worker threads are reused, so never inherit the previous request's trace
+    _trace.set(None)
+    _current_span.set(None)
+
+    # Head-based sampling: a trusted caller's decision wins, otherwise sample
+    # at random (an untrusted caller's trace id is still kept for correlation)
+    trace_id, parent_id = secrets.token_hex(16), None
+    sampled = random.random() < config.TRACE_SAMPLE_RATE
+    match = _TRACEPARENT.match(request.headers.get('traceparent', ''))
+    if match:
+        trace_id, parent_id = match.group(1), match.group(2)
+        if request.remote_addr in config.TRACE_TRUSTED_CALLERS:
+            sampled = bool(int(match.group(3), 16) & 1)
+    if not sampled:
+        return
+
+    trace = Trace(trace_id, parent_id)
+    root = trace.start_span(
+        f'{request.method} {request.url_rule.rule if request.url_rule else request.path}',
+        kind=SPAN_KIND_SERVER,
+        attributes={
+            'http.request.method': request.method,
+            'url.path': request.path,
+            'http.route': request.url_rule.rule if request.url_rule else '',
+            'request.id': g.request_id
+        }
+    )
+    g.trace = trace
+    g.trace_root = root
+    _trace.set(trace)
+    _current_span.set(root)
+
+def _finish_request(response):
+    """after_request hook: echo the request id and export the trace once the body is sent"""
+    request_id = g.get('request_id')
+    if request_id:
+        response.headers[config.REQUEST_ID_HEADER] = request_id
+
+    trace = g.get('trace')
+    if trace is None:
+        return response
+    root = g.trace_root
+    root.attributes['http.response.status_code'] = response.status_code
+    ledger = g.get('sql_ledger')  # Still growing while a streamed body renders
+
+    def finished():
+        if ledger is not None:
+            root.attributes['db.statements'] = len(ledger)
+        root.end()
+        if response.status_code >= 500:
+            root.error = f'HTTP {response.status_code}'
+        _export(trace)
+
+    if response.direct_passthrough:
+        # File responses never run the response's close callbacks
+        finished()
+    else:
+        response.call_on_close(finished)
+    return response
+
+def _template_started(sender, template, context, **extra):
+    """before_render_template signal: open a span for the template and make it current"""
+    trace = _trace.get()
+    if trace is not None:
+        span = trace.start_span('render ' + (template.name or 'template'))
+        trace.templates.append((span, _current_span.get()))
+        # Queries and cache lookups made while rendering nest under the template
+        _current_span.set(span)
+
+def _template_finished(sender, template, context, **extra):
+    """template_rendered signal: close the template's span and restore the enclosing one"""
+    trace = _trace.get()
+    if trace is not None and trace.templates:
+        span, enclosing = trace.templates.pop()
+        span.end()
+        # Streamed templates finish after the view returned, so set rather than
+        # reset a token (which only works in the context that created it)
+        _current_span.set(enclosing)
+
+def init_tracing(app):
+    """
+    Trace sampled requests to TRACE_FILE and tag every response with a request id
+
+    Args:
+        app (Flask): Application to trace
+    """
+    if not _exporter.handlers:
+        os.makedirs(os.path.dirname(config.TRACE_FILE), exist_ok=True)
+        handler = RotatingFileHandler(
+            config.TRACE_FILE,
+            maxBytes=config.TRACE_FILE_MAX_BYTES,
+            backupCount=config.TRACE_FILE_BACKUPS,
+            encoding='utf-8'
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        _exporter.addHandler(handler)
+        _exporter.setLevel(logging.INFO)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)